@@ -0,0 +1,78 @@
+"""Times HTML extraction for the scraper before and after parsing only the needed region
+
+Run from the python directory:
+
+    python -m benchmarks.bench_html_extract [--runs N]
+
+"legacy" is the scraper as it was: a full BeautifulSoup tree of every page with the default
+parser, searched for the <td> cells or the <pre class="styled"> element. Pages are the day and
+section pages in the test resources, which are real congress.gov pages.
+"""
+import argparse
+import os
+import warnings
+from time import perf_counter
+
+from bs4 import BeautifulSoup
+
+from cr.html_extract import extract_links, extract_record
+
+resources_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test", "resources")
+day_files = ["test_page_20100101.txt", "test_page_20100102.txt"]
+record_files = ["test_record1.txt", "test_record2.txt", "test_record3.txt"]
+
+
+def legacy_extract_links(html):
+    links = BeautifulSoup(html).find_all("td")
+    return [links[i].a.get("href") for i in range(len(links)) if i % 2 == 0]
+
+
+def legacy_extract_record(html):
+    text = BeautifulSoup(html).find("pre", class_="styled").contents
+    return "".join(str(text))
+
+
+def time_pages(function, pages, runs):
+    """Returns the best pages per second over runs passes, and the results of the last pass"""
+    best = None
+    for _ in range(runs):
+        start = perf_counter()
+        results = [function(page) for page in pages]
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(pages) / best, results
+
+
+def read_pages(names):
+    pages = []
+    for name in names:
+        with open(os.path.join(resources_dir, name), "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def main(runs):
+    # The legacy code doesn't name a parser, which warns on every page
+    warnings.simplefilter("ignore")
+    day_pages = read_pages(day_files)
+    record_pages = read_pages(record_files)
+
+    legacy_links_rate, legacy_links = time_pages(legacy_extract_links, day_pages, runs)
+    links_rate, links = time_pages(extract_links, day_pages, runs)
+    assert legacy_links == links
+    legacy_record_rate, legacy_records = time_pages(legacy_extract_record, record_pages, runs)
+    record_rate, records = time_pages(extract_record, record_pages, runs)
+    assert legacy_records == records
+
+    size = sum(len(p) for p in day_pages + record_pages)
+    print(f"{len(day_pages)} day pages, {len(record_pages)} section pages, {size / 1e3:.0f} kB")
+    print(f"{'stage':<30}{'before':>15}{'after':>15}")
+    print(f"{'day page links (pages/s)':<30}{legacy_links_rate:>15,.0f}{links_rate:>15,.0f}")
+    print(f"{'section text (pages/s)':<30}{legacy_record_rate:>15,.0f}{record_rate:>15,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20, help="passes over the pages; the best is kept")
+    args = parser.parse_args()
+    main(args.runs)
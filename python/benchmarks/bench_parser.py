@@ -0,0 +1,86 @@
+"""Times CRParser page processing before and after precompiling its regexes
+
+Run from the python directory:
+
+    python -m benchmarks.bench_parser [--repeat N]
+
+The test resources are tiny, so the parsing test input is repeated to build a day large
+enough to time. "legacy" is the per-page code as it was before the patterns were compiled:
+two title matches, a separate title substitution, a whitespace match and a cleaning
+substitution, all from string patterns.
+"""
+import argparse
+import os
+import re
+from time import perf_counter
+
+from cr.parse_congressional_record import (
+    CRParser,
+    PAGE_BREAK_INDICATOR,
+    PAGE_BREAK_REGEX,
+    TITLE_INDICATOR,
+    parse_page,
+)
+
+resources_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test", "resources")
+test_file = "parsing_test_input.txt"
+
+
+def legacy_parse_pages(pages):
+    speeches = []
+    for page in pages:
+        if not re.match(TITLE_INDICATOR, page):
+            title = ""
+        else:
+            title = re.match(TITLE_INDICATOR, page).group(1)
+        if not re.match("^\\s+$", page):
+            if title:
+                page = re.sub(TITLE_INDICATOR, "", page)
+            speeches.append((title, re.sub('^[\n\\s]+', '', page)))
+    return speeches
+
+
+def single_pass_parse_pages(pages):
+    speeches = []
+    for page in pages:
+        parsed = parse_page(page)
+        if parsed is not None:
+            speeches.append((parsed[0], parsed[1].lstrip()))
+    return speeches
+
+
+def time_best(function, argument, runs=5):
+    best = None
+    for _ in range(runs):
+        start = perf_counter()
+        result = function(argument)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(repeat):
+    with open(os.path.join(resources_dir, test_file)) as f:
+        text = f.read() * repeat
+
+    legacy_split = lambda t: re.split(PAGE_BREAK_INDICATOR, t)
+    compiled_split = lambda t: PAGE_BREAK_REGEX.split(t)
+    split_seconds, pages = time_best(legacy_split, text)
+    compiled_split_seconds, compiled_pages = time_best(compiled_split, text)
+    assert pages == compiled_pages
+
+    legacy_seconds, legacy_speeches = time_best(legacy_parse_pages, pages)
+    single_pass_seconds, speeches = time_best(single_pass_parse_pages, pages)
+    assert legacy_speeches == speeches
+
+    print(f"{len(pages)} pages, {len(text) / 1e6:.1f} MB")
+    print(f"{'stage':<30}{'before':>15}{'after':>15}")
+    print(f"{'split (pages/s)':<30}{len(pages) / split_seconds:>15,.0f}{len(pages) / compiled_split_seconds:>15,.0f}")
+    print(f"{'title/body/empty (pages/s)':<30}{len(pages) / legacy_seconds:>15,.0f}{len(pages) / single_pass_seconds:>15,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000, help="copies of the test input in the day")
+    args = parser.parse_args()
+    main(args.repeat)
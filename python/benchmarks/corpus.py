@@ -0,0 +1,146 @@
+"""Synthetic Congressional Record days for benchmarks
+
+Sections are generated as congress.gov section pages, and a day's archived text is made from
+them by the scraper's own extraction, so it has exactly the escaped format CRScraper saves.
+Write a directory of synthetic daily files with:
+
+    python -m benchmarks.corpus DIRECTORY [--days N] [--sections N] [--speeches N]
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+from cr.html_extract import extract_record
+
+SPEAKERS = [
+    "The PRESIDING OFFICER",
+    "Mr. McCONNELL",
+    "Mr. REID",
+    "Mrs. BOXER",
+    "Ms. COLLINS",
+    "Mr. DURBIN",
+    "Ms. LANDRIEU",
+]
+TITLES = [
+    "APPOINTMENT OF ACTING PRESIDENT PRO TEMPORE",
+    "MORNING BUSINESS",
+    "HEALTH CARE REFORM",
+    "NATIONAL DEFENSE AUTHORIZATION ACT",
+    "ORDERS FOR TUESDAY, JANUARY 19, 2010",
+    "TRIBUTE TO VETERANS",
+]
+WORDS = (
+    "the Senate bill amendment committee President time vote health care reform state "
+    "people American families jobs economy budget tax cut year program support funding "
+    "law act federal government debate floor colleagues important today measure"
+).split()
+PAGE_URL = "/congressional-record/volume-156/{section}-section/page/{page}"
+
+
+def wrap(words, width=70):
+    """Joins words into lines of at most width characters, as the Record is laid out"""
+    lines = []
+    line = ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line + " ")
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return "\n".join(lines)
+
+
+def section_html(chamber, page, title, speeches):
+    """A section page whose <pre> holds one page header, a title and (speaker, text) speeches"""
+    section = "senate" if chamber == "S" else "house"
+    anchor = f'<a href="{PAGE_URL.format(section=section, page=page)}">Page {page}</a>'
+    body = "\n".join(f"  {speaker}. {text}" for speaker, text in speeches)
+    return (
+        "<html><head><title>Congressional Record</title></head><body>\n"
+        '<pre class="styled">\n'
+        f"[{anchor}]\n"
+        "From the Congressional Record Online through the Government Publishing Office "
+        "[www.gpo.gov]\n"
+        f"{title}\n\n{body}\n\n"
+        "                          ____________________\n\n\n"
+        "</pre>\n</body></html>"
+    )
+
+
+def generate_sections(
+    sections=100, speeches=8, words=120, chamber="S", seed=0, first_page=1
+):
+    """Returns the HTML of a day's section pages
+
+    : param sections: section pages in the day
+    : param speeches: speeches in each section
+    : param words: average words in each speech
+    """
+    rng = random.Random(seed)
+    pages = []
+    for number in range(sections):
+        speech_list = [
+            (
+                rng.choice(SPEAKERS),
+                wrap(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words * 3 // 2))),
+            )
+            for _ in range(speeches)
+        ]
+        page = f"{chamber}{first_page + number // 3}"
+        pages.append(section_html(chamber, page, rng.choice(TITLES), speech_list))
+    return pages
+
+
+def day_page_html(links, chamber="S"):
+    """The day page linking to the section pages at links, as CRScraper.get_links reads it"""
+    section = "senate" if chamber == "S" else "house"
+    page_link = PAGE_URL.format(section=section, page=chamber + "1")
+    rows = "".join(
+        f'<tr><td>{n + 1}.&nbsp;<a href="{link}">Section {n + 1}</a></td>'
+        f'<td><a href="{page_link}">{chamber}1</a></td></tr>'
+        for n, link in enumerate(links)
+    )
+    return (
+        '<html><body><table class="item_table"><tbody>'
+        f"{rows}</tbody></table></body></html>"
+    )
+
+
+def archived_day(section_pages):
+    """The text CRScraper saves for a day made of section_pages"""
+    return " ".join(extract_record(page) for page in section_pages)
+
+
+def generate_day(sections=100, speeches=8, words=120, chamber="S", seed=0):
+    """Returns one synthetic day of archived text"""
+    return archived_day(generate_sections(sections, speeches, words, chamber, seed))
+
+
+def write_corpus(directory, days=10, start=date(2010, 1, 4), **options):
+    """Writes days of synthetic daily files for each chamber to directory"""
+    os.makedirs(directory, exist_ok=True)
+    for n in range(days):
+        day = start + timedelta(n)
+        for chamber in "HS":
+            path = os.path.join(directory, f"{chamber}{day}.txt")
+            with open(path, "w") as f:
+                f.write(generate_day(chamber=chamber, seed=n, **options))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=str)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--sections", type=int, default=100, help="section pages per day")
+    parser.add_argument("--speeches", type=int, default=8, help="speeches per section")
+    parser.add_argument("--words", type=int, default=120, help="average words per speech")
+    args = parser.parse_args()
+    write_corpus(
+        args.directory,
+        args.days,
+        sections=args.sections,
+        speeches=args.speeches,
+        words=args.words,
+    )
@@ -0,0 +1,172 @@
+"""Times the parser stages and the scraper on synthetic days, with throughput and peak memory
+
+Run from the python directory:
+
+    python -m benchmarks.run_benchmarks [--sections N] [--runs N] [--json results.json]
+        [--baseline results.json]
+
+Each stage is timed over --runs runs and the best is kept. Peak memory is what a stage
+allocates on top of what it was given, measured with tracemalloc on one more run. With
+--baseline, stages that got slower or bigger by more than --tolerance are listed and the exit
+status is 1, so a regression shows up when the results are compared in review.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+from time import perf_counter
+
+from benchmarks.corpus import archived_day, day_page_html, generate_sections
+from cr.http_session import CRSession
+from cr.parse_congressional_record import CRParser, writer_helper
+from cr.scrape_congressional_record import CRScraper
+from test.stub_server import StubResponse, StubServer
+
+DAY = date(2010, 1, 4)
+
+
+def parser_stages(text, output_path):
+    """(name, function) for each CRParser stage, run in order on one parser"""
+    parser = CRParser.from_text(text, f"S{DAY}.txt")
+
+    def write():
+        # writer_helper prints the titles it writes
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer_helper(parser.speeches, output_path)
+
+    return [
+        ("split_pages", parser.split_pages),
+        ("add_titled_speeches", parser.add_titled_speeches_to_collection),
+        ("clean_speeches", parser.clean_speeches),
+        ("writer_helper", write),
+        ("iter_records", lambda: list(CRParser.from_text(text, parser.file_path).iter_records())),
+    ]
+
+
+def measure(stages_factory, runs):
+    """Returns {stage: (best seconds, peak bytes)} for the stages from stages_factory()"""
+    seconds = {}
+    for _ in range(runs):
+        for name, function in stages_factory():
+            start = perf_counter()
+            function()
+            elapsed = perf_counter() - start
+            seconds[name] = min(elapsed, seconds.get(name, elapsed))
+    peaks = {}
+    for name, function in stages_factory():
+        tracemalloc.start()
+        function()
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {name: (seconds[name], peaks[name]) for name in seconds}
+
+
+def scrape_stages(server, section_pages, output_path, max_workers):
+    """Serves a day of section_pages from server and returns the stage scraping it"""
+    links = []
+    for n, page in enumerate(section_pages):
+        links.append(f"/section/{n}")
+        server.add(links[-1], StubResponse(body=page.encode("utf-8")))
+    server.add("/day", StubResponse(body=day_page_html(links).encode("utf-8")))
+
+    def scrape():
+        session = CRSession(max_retries=0, pool_size=max_workers)
+        scraper = CRScraper(server.url("/day"), output_path, max_workers=max_workers, session=session)
+        # Section links are relative, so they resolve to the stub server
+        scraper.link_prefix = server.url("")
+        try:
+            scraper.run()
+        finally:
+            session.close()
+
+    return [(f"scrape ({max_workers} workers)", scrape)]
+
+
+def run(sections, speeches, words, runs, max_workers):
+    section_pages = generate_sections(sections, speeches, words, seed=0)
+    text = archived_day(section_pages)
+    directory = tempfile.mkdtemp()
+    output_path = os.path.join(directory, "speeches.tsv")
+    try:
+        results = measure(lambda: parser_stages(text, output_path), runs)
+        server = StubServer().start()
+        try:
+            stages = scrape_stages(server, section_pages, output_path, max_workers)
+            results.update(measure(lambda: stages, runs))
+        finally:
+            server.stop()
+    finally:
+        shutil.rmtree(directory)
+    megabytes = len(text) / 1e6
+    return {
+        name: {
+            "seconds": elapsed,
+            "mb_per_second": megabytes / elapsed,
+            "sections_per_second": sections / elapsed,
+            "peak_mb": peak / 1e6,
+        }
+        for name, (elapsed, peak) in results.items()
+    }, megabytes
+
+
+def regressions(results, baseline, tolerance):
+    """Stages slower or using more memory than baseline by more than tolerance"""
+    found = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result["mb_per_second"] < old["mb_per_second"] * (1 - tolerance):
+            found.append(f"{name}: {old['mb_per_second']:.2f} -> {result['mb_per_second']:.2f} MB/s")
+        if result["peak_mb"] > old["peak_mb"] * (1 + tolerance):
+            found.append(f"{name}: {old['peak_mb']:.1f} -> {result['peak_mb']:.1f} MB peak")
+    return found
+
+
+def main(sections, speeches, words, runs, max_workers, json_path=None, baseline_path=None, tolerance=0.2):
+    results, megabytes = run(sections, speeches, words, runs, max_workers)
+    print(f"Synthetic day: {sections} sections, {megabytes:.1f} MB archived")
+    print(f"{'stage':<26}{'MB/s':>10}{'sections/s':>14}{'peak MB':>10}")
+    for name, result in results.items():
+        print(f"{name:<26}{result['mb_per_second']:>10.2f}{result['sections_per_second']:>14,.0f}{result['peak_mb']:>10.1f}")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=1)
+    if baseline_path:
+        with open(baseline_path) as f:
+            found = regressions(results, json.load(f), tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=200, help="section pages in the synthetic day")
+    parser.add_argument("--speeches", type=int, default=8, help="speeches per section")
+    parser.add_argument("--words", type=int, default=120, help="average words per speech")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs of each stage; the best is kept")
+    parser.add_argument("--max-workers", type=int, default=4, help="section pages the scraper fetches at once")
+    parser.add_argument("--json", type=str, default=None, help="write results here")
+    parser.add_argument("--baseline", type=str, default=None, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fractional slowdown or growth")
+    args = parser.parse_args()
+    sys.exit(
+        main(
+            args.sections,
+            args.speeches,
+            args.words,
+            args.runs,
+            args.max_workers,
+            json_path=args.json,
+            baseline_path=args.baseline,
+            tolerance=args.tolerance,
+        )
+    )
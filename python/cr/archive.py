@@ -0,0 +1,114 @@
+"""Reading and writing daily files that may be compressed
+
+A daily file is H<date>.txt or S<date>.txt, optionally followed by .gz or, with the zstandard
+package installed, .zst. Compressed files are read and written as streams, never whole, except
+by mapped_bytes.
+"""
+
+import gzip
+import hashlib
+import io
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# File name suffix by compression name
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def compressed_name(file_path, compression=None):
+    """Appends the suffix of compression (None, "gzip" or "zstd") to file_path"""
+    if compression is None:
+        return file_path
+    return file_path + COMPRESSION_SUFFIXES[compression]
+
+
+def write_atomic(path, data):
+    """Writes data (str or bytes) so that readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def file_hash(file_path):
+    """sha256 of a file's bytes, read a chunk at a time"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shard_directory(directory, chamber, day):
+    """The <chamber>/<year>/<month> shard of directory holding day, as cr.layout shards archives"""
+    day = str(day)
+    return os.path.join(directory, chamber.upper(), day[:4], day[5:7])
+
+
+def day_file(directory, chamber, day):
+    """Returns the path of chamber's daily file for day in directory, whatever its compression
+
+    The file may be in directory itself or in its shard (see cr.layout).
+
+    : param day: a date or "YYYY-MM-DD"
+    """
+    name = f"{chamber.upper()}{day}.txt"
+    for folder in [directory, shard_directory(directory, chamber, day)]:
+        path = os.path.join(folder, name)
+        for candidate in [path] + [path + s for s in COMPRESSION_SUFFIXES.values()]:
+            if os.path.exists(candidate):
+                return candidate
+    raise FileNotFoundError(f"No daily file for {chamber.upper()} {day} in {directory}")
+
+
+def open_binary(file_path):
+    """Opens a daily file for reading bytes, decompressed by its suffix"""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rb")
+    if file_path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstd files need zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"))
+    return open(file_path, "rb")
+
+
+def open_text(file_path, mode="r"):
+    """Opens a daily file for reading ("r") or writing ("w") text, compressed by its suffix"""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, mode + "t", encoding="utf-8")
+    if file_path.endswith(".zst"):
+        if mode == "r":
+            return io.TextIOWrapper(open_binary(file_path), encoding="utf-8")
+        if zstandard is None:
+            raise ImportError("zstd files need zstandard: pip install zstandard")
+        stream = zstandard.ZstdCompressor(level=10).stream_writer(open(file_path, "wb"))
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(file_path, mode)
+
+
+@contextmanager
+def mapped_bytes(file_path):
+    """Yields the contents of a daily file as a bytes-like object without reading it into memory
+
+    A plain file is memory-mapped read only; a compressed one can't be, so it is decompressed
+    into bytes.
+    """
+    if file_path.endswith((".gz", ".zst")):
+        with open_binary(file_path) as f:
+            yield f.read()
+        return
+    with open(file_path, "rb") as f:
+        # An empty file can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            yield mapping
@@ -0,0 +1,208 @@
+"""Scrapes several CRWriter time periods, e.g. both chambers, at once on one asyncio event loop
+
+Every request of every chamber is scheduled on the same loop, so the nightly job takes about as
+long as its slowest chamber rather than the sum of both. Requests go through the writers'
+CRSession (retries, cache, metrics and its rate limiter) in a pool of threads; the loop only
+decides what runs when. Concurrency is bounded per host, and days and output files are exactly
+those of CRWriter.run.
+
+    python -m cr.async_scrape DIRECTORY STARTDATE ENDDATE [--houses hs] [--connections N]
+"""
+
+import argparse
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from cr.http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from cr.http_session import CRSession, RateLimiter
+from cr.metrics import Metrics
+from cr.scrape_congressional_record import CRScraper, CRWriter, NoCRContentException
+
+log = logging.getLogger(__name__)
+
+
+class AsyncCRScraper:
+    """Runs the pending days of several CRWriters concurrently on one event loop"""
+
+    def __init__(self, writers, connections_per_host=8, max_connections=16):
+        """
+        : param writers: CRWriters to run; give them one shared CRSession so they also share its
+            keep-alive connections and rate limiter
+        : param connections_per_host: maximum requests in flight to any one host
+        : param max_connections: maximum requests in flight in all
+        """
+        self.writers = writers
+        self.connections_per_host = connections_per_host
+        self.max_connections = max_connections
+
+    def run(self):
+        """Scrapes every writer's pending days and returns once all are done"""
+        # A new loop rather than asyncio.run, which needs Python 3.7
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.run_writers())
+        finally:
+            loop.close()
+            for manifest in {id(w.manifest): w.manifest for w in self.writers}.values():
+                if manifest:
+                    manifest.flush()
+        for session_writer in {id(w.session): w for w in self.writers}.values():
+            session_writer.finish()
+
+    async def run_writers(self):
+        loop = asyncio.get_event_loop()
+        # Created here so they belong to the running loop
+        self.host_limits = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.max_connections)
+        tasks = [loop.create_task(self.run_writer(writer)) for writer in self.writers]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # As in CRWriter.run_parallel, nothing more is started once a day has failed
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self.executor.shutdown(wait=True)
+
+    async def run_writer(self, writer):
+        """Scrapes writer's pending days, parallel_days of them at a time"""
+        days_limit = asyncio.Semaphore(max(writer.parallel_days, 1))
+
+        async def run_limited(day, link, filename):
+            async with days_limit:
+                await self.run_day(writer, day, link, filename)
+
+        await asyncio.gather(
+            *(run_limited(d, l, f) for d, l, f in writer.pending_days())
+        )
+
+    async def call(self, url, function, *args):
+        """Runs function(*args), which requests url, in the thread pool under url's host limit"""
+        host = urlsplit(url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.connections_per_host)
+        async with self.host_limits[host]:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, function, *args)
+
+    async def run_day(self, writer, day, link, filename):
+        """The counterpart of CRWriter.run_day, fetching the day's sections concurrently"""
+        s = CRScraper(link, filename, session=writer.session)
+        writer.day_started(day)
+        try:
+            log.info("Retrieving content for " + link)
+            with writer.metrics.time("scrape_day"):
+                links = await self.call(link, s.get_links)
+                if len(links) == 0:
+                    raise NoCRContentException
+                # gather returns the pages in the order of links
+                pages = await asyncio.gather(
+                    *(self.call(url, s.scrape_page, url) for url in links)
+                )
+            s.content = " ".join(pages)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            writer.day_failed(day, link, e)
+            return
+        # Saving and the sink may block, e.g. on a full pipeline queue
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, writer.day_scraped, day, s)
+
+
+def scrape_chambers(
+    periods,
+    directory,
+    connections_per_host=8,
+    requests_per_second=None,
+    jitter=0.0,
+    cache=None,
+    metrics=None,
+    **options,
+):
+    """Scrapes (house, startdate, enddate) periods, e.g. one per chamber, at once
+
+    All periods share one CRSession, so one rate limit and one connection pool cover them.
+    Other options (manifest, compression, parallel_days, ...) are passed to each CRWriter.
+
+    : param periods: (house, startdate, enddate) with house "h" or "s" and dates as m-d-Y
+    """
+    rate_limiter = (
+        RateLimiter(requests_per_second, jitter) if requests_per_second else None
+    )
+    session = CRSession(
+        pool_size=connections_per_host,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        metrics=metrics,
+    )
+    writers = [
+        CRWriter(house, directory, startdate, enddate, session=session, **options)
+        for house, startdate, enddate in periods
+    ]
+    try:
+        AsyncCRScraper(
+            writers,
+            connections_per_host=connections_per_host,
+            max_connections=connections_per_host * len(writers),
+        ).run()
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=str, help="directory for saving transcripts")
+    parser.add_argument("startdate", type=str, help="start date (m-d-Y)")
+    parser.add_argument("enddate", type=str, help="end date (m-d-Y)")
+    parser.add_argument(
+        "--houses", type=str, default="hs", help="chambers to scrape (h, s or hs)"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=8,
+        help="maximum requests in flight to one host",
+    )
+    parser.add_argument(
+        "--parallel-days",
+        type=int,
+        default=1,
+        help="number of days of each chamber scraped at once",
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=None,
+        help="request budget shared by all chambers; unlimited if not given",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="bypass the HTTP cache and download every page again",
+    )
+    parser.add_argument(
+        "--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="HTTP cache directory"
+    )
+    parser.add_argument(
+        "--metrics-json", type=str, default=None, help="write a JSON run report here"
+    )
+
+    args = parser.parse_args()
+    metrics = Metrics() if args.metrics_json else None
+    try:
+        scrape_chambers(
+            [(house, args.startdate, args.enddate) for house in args.houses],
+            args.directory,
+            connections_per_host=args.connections,
+            requests_per_second=args.requests_per_second,
+            cache=None if args.no_cache else ResponseCache(args.cache_dir),
+            metrics=metrics,
+            parallel_days=args.parallel_days,
+        )
+    finally:
+        if metrics:
+            metrics.save(args.metrics_json)
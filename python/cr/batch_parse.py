@@ -0,0 +1,313 @@
+"""Parses a directory (or glob) of daily Congressional Record files across a process pool
+
+Input files are the H<date>.txt/S<date>.txt files written by CRWriter, in a flat or sharded
+archive directory (see cr.layout). Rows are written in
+(date, chamber) order whatever the number of workers, either to one combined file or to one
+file per shard.
+"""
+
+import argparse
+import glob
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from cr.archive import COMPRESSION_SUFFIXES
+from cr.fingerprints import ParseFingerprints, file_fingerprint
+from cr.layout import ShardedLayout, in_range
+from cr.manifest import FILENAME_REGEX, day_of_file
+from cr.metrics import NULL_METRICS, Metrics
+from cr.parse_congressional_record import CRParser
+from cr.records import Speech
+from cr.speech_store import SpeechStore
+from cr.writers import SHARD_KEYS, WRITER_FORMATS, AppendingTSVWriter, ShardedWriter
+
+log = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = dict(WRITER_FORMATS, sqlite=SpeechStore)
+
+
+def form_rank(file_path):
+    """0 for a plain daily file, else its compression's place in COMPRESSION_SUFFIXES
+
+    Of several files for one day, the lowest ranked is the one cr.archive.day_file reads.
+    """
+    for rank, suffix in enumerate(COMPRESSION_SUFFIXES.values(), 1):
+        if file_path.endswith(suffix):
+            return rank
+    return 0
+
+
+def find_input_files(inputs, start=None, end=None):
+    """Expands directories and glob patterns into daily files sorted by (date, chamber)
+
+    A sharded archive directory is enumerated from the indexes of the months from start to end.
+    There is one file per (chamber, date): if a day is there both plain and compressed, or in
+    more than one input, the plain file (else .gz, else .zst) of the first input is used.
+
+    : param start: first date (Y-m-d) to include; None for no lower bound
+    : param end: last date (Y-m-d) to include; None for no upper bound
+    """
+    start, end = start and str(start), end and str(end)
+    files = {}
+    for order, path in enumerate(inputs):
+        if os.path.isdir(path) and ShardedLayout.detect(path):
+            candidates = ShardedLayout(path).files(start, end)
+        elif os.path.isdir(path):
+            candidates = glob.glob(os.path.join(path, "[HS]*.txt*"))
+        else:
+            candidates = glob.glob(path)
+        for f in candidates:
+            match = FILENAME_REGEX.match(os.path.basename(f))
+            if not match or not in_range(match.group(2), start, end):
+                continue
+            rank = form_rank(f), order
+            key = match.group(2), match.group(1)
+            if key in files:
+                kept = min(files[key], (rank, f))
+                log.warning(
+                    f"{f} and {files[key][1]} are the same day; using {kept[1]}"
+                )
+                files[key] = kept
+            else:
+                files[key] = rank, f
+    return [files[key][1] for key in sorted(files)]
+
+
+def parser_rows(parser, chamber, day, metrics=NULL_METRICS):
+    """Returns a CRParser's records as Speech rows"""
+    with metrics.time("parse"):
+        rows = [
+            Speech(day, chamber, title, speaker, pages, text)
+            for title, speaker, pages, text in parser.iter_records(with_pages=True)
+        ]
+    metrics.count("days_parsed")
+    metrics.count("pages_split", parser.pages_split)
+    metrics.count("speeches", len(rows))
+    return rows
+
+
+def parse_day_file(file_path, metrics=NULL_METRICS, memory_map=False):
+    """Parses one daily file into Speech rows
+
+    : param memory_map: find pages in a memory map of the file rather than reading it in chunks
+    """
+    chamber, day = day_of_file(file_path)
+    parser = CRParser(file_path, stream=True, memory_map=memory_map)
+    return parser_rows(parser, chamber, day, metrics)
+
+
+def parse_day_job(file_path, memory_map=False, measure=False, fingerprint=False):
+    """parse_day_file for a worker process; returns (rows, metrics report, fingerprint)
+
+    : param measure: report the parse's metrics; else the report is None
+    : param fingerprint: hash the file too, see cr.fingerprints.file_fingerprint; else the
+        fingerprint is None
+    """
+    found = file_fingerprint(file_path) if fingerprint else None
+    metrics = Metrics() if measure else NULL_METRICS
+    rows = parse_day_file(file_path, metrics, memory_map)
+    return rows, metrics.report() if measure else None, found
+
+
+def parse_files(
+    files,
+    workers=None,
+    window=None,
+    metrics=NULL_METRICS,
+    memory_map=False,
+    fingerprints=None,
+):
+    """Yields each file's rows in input order, parsing up to workers files at once
+
+    : param workers: number of processes; defaults to the number of CPUs, 1 parses in this process
+    : param window: most files submitted to the pool and not yet yielded; defaults to twice
+        workers, so that parsed rows waiting on a slow earlier file don't pile up in memory
+    : param metrics: Metrics the parse counts and timings are added to
+    : param memory_map: memory-map each file, see parse_day_file
+    : param fingerprints: ParseFingerprints to add each file's fingerprint to, hashed alongside
+        its parse
+    """
+    job = partial(
+        parse_day_job,
+        memory_map=memory_map,
+        measure=metrics.enabled,
+        fingerprint=fingerprints is not None,
+    )
+
+    def parsed(file_path, result):
+        rows, report, found = result
+        if report:
+            metrics.merge(report)
+        if found:
+            fingerprints.add_pending(file_path, found)
+        return rows
+
+    if workers == 1:
+        for file_path in files:
+            yield parsed(file_path, job(file_path))
+        return
+    workers = workers or os.cpu_count() or 1
+    window = window or 2 * workers
+    files = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Results are handed back in input order, so the output doesn't depend on scheduling
+        pending = deque()
+        for file_path in files:
+            pending.append((file_path, executor.submit(job, file_path)))
+            if len(pending) >= window:
+                break
+        while pending:
+            file_path, future = pending.popleft()
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append((next_file, executor.submit(job, next_file)))
+            yield parsed(file_path, future.result())
+
+
+def run_batch(
+    inputs,
+    output,
+    workers=None,
+    shard_by=None,
+    output_format="tsv",
+    append=False,
+    metrics=NULL_METRICS,
+    memory_map=False,
+    force=False,
+    start=None,
+    end=None,
+):
+    """Parses every daily file under inputs into output; returns the number of files parsed
+
+    Fingerprints of the files parsed are saved next to output. When output is added to rather
+    than rewritten (append, or sqlite, which keeps days it isn't given), files that haven't
+    changed since they were parsed into it with the same parser configuration are skipped.
+
+    : param inputs: list of directories or glob patterns
+    : param output: output file, or output directory when shard_by is given
+    : param shard_by: None for one combined file, else one of SHARD_KEYS
+    : param output_format: one of OUTPUT_FORMATS
+    : param append: add the days to existing TSV output, replacing days already in it
+    : param metrics: Metrics for parse and write counts and timings
+    : param memory_map: memory-map each input file instead of reading it in chunks
+    : param force: parse every file even if its fingerprint is unchanged
+    : param start: first date (Y-m-d) to parse; None for no lower bound
+    : param end: last date (Y-m-d) to parse; None for no upper bound
+    """
+    incremental = append or output_format == "sqlite"
+    fingerprints = ParseFingerprints(output, reset=force or not incremental)
+    files = []
+    for file_path in find_input_files(inputs, start, end):
+        if fingerprints.is_current(file_path):
+            metrics.count("days_skipped")
+        else:
+            files.append(file_path)
+    log.info(f"Parsing {len(files)} files")
+    with open_writer(output, output_format, shard_by, append) as writer:
+        for rows in parse_files(
+            files,
+            workers,
+            metrics=metrics,
+            memory_map=memory_map,
+            fingerprints=fingerprints,
+        ):
+            with metrics.time("write"):
+                writer.write_rows(rows)
+    # Writers may buffer rows until they are closed, so days only count as written after that
+    for file_path in files:
+        fingerprints.record(file_path)
+    fingerprints.save()
+    return len(files)
+
+
+def open_writer(output, output_format="tsv", shard_by=None, append=False):
+    """Returns the writer for run_batch's output options"""
+    writer_class = OUTPUT_FORMATS[output_format]
+    if append:
+        if output_format != "tsv":
+            raise ValueError("Only tsv output can be appended to")
+        writer_class = AppendingTSVWriter
+    if shard_by:
+        return ShardedWriter(output, SHARD_KEYS[shard_by], writer_class)
+    return writer_class(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "inputs",
+        type=str,
+        nargs="+",
+        help="directories or glob patterns of daily files",
+    )
+    parser.add_argument(
+        "output", type=str, help="output file, or directory with --shard-by"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of processes; defaults to the CPU count",
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=sorted(SHARD_KEYS),
+        default=None,
+        help="write one file per year, month or day",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(OUTPUT_FORMATS),
+        default="tsv",
+        help="output format; parquet needs pyarrow, sqlite has a full-text index",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="add to existing tsv output, replacing days already in it",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="parse every file, even those unchanged since they were parsed into output",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="memory-map input files; uses less memory on large archives",
+    )
+    parser.add_argument(
+        "--start", type=str, default=None, help="first date (Y-m-d) to parse"
+    )
+    parser.add_argument(
+        "--end", type=str, default=None, help="last date (Y-m-d) to parse"
+    )
+    parser.add_argument(
+        "--metrics-json", type=str, default=None, help="write a JSON run report here"
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        default=None,
+        help="write run metrics here as a Prometheus textfile",
+    )
+
+    args = parser.parse_args()
+    metrics = Metrics() if args.metrics_json or args.metrics_prom else NULL_METRICS
+    run_batch(
+        args.inputs,
+        args.output,
+        workers=args.workers,
+        shard_by=args.shard_by,
+        output_format=args.format,
+        append=args.append,
+        metrics=metrics,
+        memory_map=args.mmap,
+        force=args.force,
+        start=args.start,
+        end=args.end,
+    )
+    metrics.save(args.metrics_json, args.metrics_prom)
@@ -0,0 +1,92 @@
+"""Fingerprints of the daily files already parsed into an output, so unchanged days are skipped"""
+
+import json
+import logging
+import os
+
+from cr.archive import file_hash, write_atomic
+from cr.manifest import day_of_file
+from cr.parse_congressional_record import parser_config_hash
+
+log = logging.getLogger(__name__)
+
+
+def file_fingerprint(file_path):
+    """Returns the sha256, size and mtime of file_path, its size and mtime from before the hash"""
+    stat = os.stat(file_path)
+    return {
+        "sha256": file_hash(file_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class ParseFingerprints:
+    """JSON file kept next to a parse output, fingerprinting each day whose rows are in it
+
+    A day's fingerprint is the sha256 of its raw file plus the file's size and mtime, under the
+    hash of the parser configuration (see parser_config_hash). A file is current if the output
+    holds rows parsed from the same bytes with the same configuration. Only its size and mtime
+    are checked up front, so an unchanged archive is checked without reading it; just a file of
+    the same size with a new mtime is hashed, and still counts as current if it was only
+    touched. Files that are parsed are hashed where they are parsed, and their fingerprints
+    handed back through add_pending. Any change to the configuration makes every day stale.
+    """
+
+    suffix = ".fingerprints.json"
+
+    def __init__(self, output, reset=False):
+        """
+        : param output: the parse output file or directory the fingerprints describe
+        : param reset: start empty, for an output that is being written from scratch
+        """
+        self.path = output.rstrip(os.sep) + self.suffix
+        self.config = parser_config_hash()
+        self.days = {}
+        # Fingerprints of the files being parsed, recorded once the day is written
+        self.pending = {}
+        # Fingerprints are only good while the output they describe is there
+        if reset or not os.path.exists(output) or not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            saved = json.load(f)
+        if saved["config"] == self.config:
+            self.days = saved["days"]
+        else:
+            log.info("Parser configuration changed; every day will be parsed again")
+
+    @staticmethod
+    def key(file_path):
+        chamber, day = day_of_file(file_path)
+        return chamber + day
+
+    def is_current(self, file_path):
+        """True if the output already holds the rows of file_path as it is now"""
+        key = self.key(file_path)
+        old = self.days.get(key)
+        if old is None:
+            return False
+        stat = os.stat(file_path)
+        if old["size"] != stat.st_size:
+            return False
+        if old["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        fingerprint = file_fingerprint(file_path)
+        if old["sha256"] != fingerprint["sha256"]:
+            return False
+        self.days[key] = fingerprint
+        return True
+
+    def add_pending(self, file_path, fingerprint):
+        """Keeps the file_fingerprint of a file being parsed until record is called for it"""
+        self.pending[self.key(file_path)] = fingerprint
+
+    def record(self, file_path):
+        """Marks file_path's day as written to the output; call after add_pending"""
+        key = self.key(file_path)
+        self.days[key] = self.pending.pop(key)
+
+    def save(self):
+        """Writes the fingerprints atomically"""
+        saved = {"config": self.config, "days": self.days}
+        write_atomic(self.path, json.dumps(saved, indent=1, sort_keys=True))
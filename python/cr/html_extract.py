@@ -0,0 +1,69 @@
+"""Pulls the few elements the scraper needs out of Congressional Record pages
+
+The scraper only needs the <td> cells of a day's table of contents and the one
+<pre class="styled"> element of each section, but the pages around them are large. Rather than
+building a tree for the whole page, the region holding those elements is cut out of the text
+first and only that region is parsed, through a SoupStrainer so nothing else is kept. The results
+are the same as from parsing the whole page.
+"""
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Named explicitly so results don't depend on which parsers happen to be installed
+PARSER = "html.parser"
+CELL_STRAINER = SoupStrainer("td")
+RECORD_STRAINER = SoupStrainer("pre", class_="styled")
+
+
+def decode(html):
+    """Decodes page bytes as UTF-8, which congress.gov serves; None if they aren't UTF-8"""
+    if isinstance(html, str):
+        return html
+    try:
+        return html.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def region(text, start, end):
+    """text from the first start to the end of the last end
+
+    Without a start tag the elements can't be there, so the region is empty. Without an end tag
+    it runs to the end of text, where the parser closes the element.
+    """
+    first = text.find(start)
+    if first < 0:
+        return ""
+    last = text.rfind(end)
+    if last < first:
+        return text[first:]
+    return text[first : last + len(end)]
+
+
+def parse_region(html, start, end, strainer):
+    text = decode(html)
+    if text is None:
+        # Let BeautifulSoup detect the encoding from the whole page
+        return BeautifulSoup(html, PARSER, parse_only=strainer)
+    return BeautifulSoup(region(text, start, end), PARSER, parse_only=strainer)
+
+
+def extract_links(html):
+    """Returns the section links in a day page's table of contents, in page order"""
+    cells = parse_region(html, "<td", "</td>", CELL_STRAINER).find_all("td")
+    # Only even numbered cells have the section links; the others link to the page number
+    return [cells[i].a.get("href") for i in range(0, len(cells), 2)]
+
+
+def extract_record(html):
+    """Returns the text of a section page as the scraper archives it
+
+    That is str() of the <pre class="styled"> element's contents: the repr of a list of its
+    strings and page-number anchors, which is what CRParser reads.
+    """
+    pre = parse_region(html, "<pre", "</pre>", RECORD_STRAINER).find(
+        "pre", class_="styled"
+    )
+    if pre is None:
+        raise ValueError('No <pre class="styled"> element in page')
+    return str(pre.contents)
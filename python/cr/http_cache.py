@@ -0,0 +1,170 @@
+"""On-disk HTTP response cache keyed by url, revalidated with conditional GETs"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from time import time
+
+import requests
+
+from cr.archive import write_atomic
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cr", "http")
+
+
+class CacheEntry:
+    """A cached response body plus the validators needed to revalidate it"""
+
+    def __init__(self, url, body, etag=None, last_modified=None, stored_at=None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at or time()
+
+    def age(self):
+        return time() - self.stored_at
+
+    def conditional_headers(self):
+        """Headers that turn a GET into a conditional GET"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self):
+        """Builds a 200 response from the cached body so callers can't tell the difference"""
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.body
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+
+class ResponseCache:
+    """Stores one body file and one json metadata file per url under directory"""
+
+    def __init__(
+        self,
+        directory=DEFAULT_CACHE_DIR,
+        max_bytes=2 * 1024**3,
+        max_age=30 * 86400,
+        fresh_for=0,
+    ):
+        """
+        : param directory: where cached responses are kept
+        : param max_bytes: total body size kept after evict(); least recently used go first
+        : param max_age: seconds an entry may go unused before evict() drops it
+        : param fresh_for: seconds an entry is served without any request; after that it is revalidated
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fresh_for = fresh_for
+        self.hits = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".body", base + ".json"
+
+    def get(self, url):
+        """Returns the CacheEntry for url or None"""
+        body_path, meta_path = self.paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            # The metadata file's mtime records last use for eviction
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(
+            url, body, meta.get("etag"), meta.get("last_modified"), meta["stored_at"]
+        )
+
+    def put(self, url, response):
+        """Stores a 200 response with its validators
+
+        A response without an ETag or Last-Modified can't be revalidated, so it is only kept
+        if fresh_for lets it be served without a request.
+        """
+        entry = CacheEntry(
+            url,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        if not (entry.etag or entry.last_modified or self.fresh_for > 0):
+            return
+        body_path, meta_path = self.paths(url)
+        write_atomic(body_path, entry.body)
+        self.write_meta(meta_path, entry)
+
+    def touch(self, entry):
+        """Marks entry as just revalidated after a 304"""
+        entry.stored_at = time()
+        self.write_meta(self.paths(entry.url)[1], entry)
+
+    def write_meta(self, meta_path, entry):
+        meta = {
+            "url": entry.url,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "stored_at": entry.stored_at,
+        }
+        write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def record_hit(self, revalidated=False):
+        with self._lock:
+            if revalidated:
+                self.revalidated += 1
+            else:
+                self.hits += 1
+
+    def evict(self):
+        """Drops entries unused for max_age, then least recently used entries until under max_bytes"""
+        now = time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            body_path = meta_path[: -len(".json")] + ".body"
+            try:
+                used_at = os.path.getmtime(meta_path)
+                size = os.path.getsize(body_path)
+            except OSError:
+                remove_quietly(meta_path, body_path)
+                continue
+            if now - used_at > self.max_age:
+                remove_quietly(meta_path, body_path)
+            else:
+                entries.append((used_at, size, meta_path, body_path))
+
+        total = sum(e[1] for e in entries)
+        for used_at, size, meta_path, body_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            remove_quietly(meta_path, body_path)
+            total -= size
+        log.info(f"HTTP cache holds {total} bytes after eviction")
+
+
+def remove_quietly(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,212 @@
+"""Shared HTTP layer for the scraper: pooled keep-alive connections, timeouts, retries with backoff and latency stats"""
+
+import logging
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cr.metrics import NULL_METRICS
+
+log = logging.getLogger(__name__)
+
+# Responses worth retrying; anything else is returned to the caller as is
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """Spaces out requests so that all threads sharing the limiter stay under a global request rate"""
+
+    def __init__(self, requests_per_second, jitter=0.0):
+        """
+        : param requests_per_second: maximum average number of requests per second
+        : param jitter: maximum number of extra seconds added at random after each request
+        """
+        self.interval = 1.0 / requests_per_second
+        self.jitter = jitter
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Claims the next request slot and returns how many seconds to wait for it"""
+        with self._lock:
+            now = monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval + random.uniform(0, self.jitter)
+        return slot - now
+
+    def wait(self):
+        """Blocks until the caller may make its next request"""
+        delay = self.reserve()
+        if delay > 0:
+            sleep(delay)
+
+
+class LatencyStats:
+    """Thread safe record of request latencies, for their percentiles
+
+    Request and retry counts are kept by the session's Metrics, not here.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def summary(self):
+        """Returns latency percentiles in seconds; empty before the first request"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "total": sum(latencies),
+            "mean": sum(latencies) / len(latencies),
+            "min": latencies[0],
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": latencies[-1],
+        }
+
+
+def retry_after_seconds(response):
+    """Returns the delay asked for by a Retry-After header (seconds or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CRSession:
+    """requests.Session wrapper shared by all requests of a scrape"""
+
+    def __init__(
+        self,
+        timeout=(10, 60),
+        max_retries=4,
+        backoff_factor=1.0,
+        max_backoff=120,
+        pool_size=10,
+        rate_limiter=None,
+        cache=None,
+        metrics=NULL_METRICS,
+    ):
+        """
+        : param timeout: seconds to wait for a connection and for a response, as for requests
+        : param max_retries: number of retries after a connection error, timeout or retryable status
+        : param backoff_factor: first retry waits this many seconds, doubling after each attempt
+        : param max_backoff: upper bound in seconds on any single wait, including Retry-After
+        : param pool_size: number of keep-alive connections kept per host
+        : param rate_limiter: optional RateLimiter consulted before every attempt
+        : param cache: optional ResponseCache; cached pages are revalidated with conditional GETs
+        : param metrics: Metrics counting requests, retries, bytes and fetch time
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.stats = LatencyStats()
+        self.metrics = metrics or NULL_METRICS
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt + 1"""
+        return min(self.max_backoff, self.backoff_factor * 2**attempt)
+
+    def request(self, url, headers=None):
+        """Makes one timed GET request, waiting for the rate limiter first"""
+        if self.rate_limiter:
+            self.rate_limiter.wait()
+        start = monotonic()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        finally:
+            elapsed = monotonic() - start
+            self.stats.record(elapsed)
+            self.metrics.add_time("fetch", elapsed)
+            self.metrics.count("requests")
+        self.metrics.count("bytes_fetched", len(response.content))
+        return response
+
+    def get(self, url):
+        """GETs url through the cache if there is one
+
+        A fresh cache entry is returned without a request; a stale one is revalidated and a
+        304 returns the cached body.
+        """
+        if not self.cache:
+            return self.get_with_retries(url)
+
+        entry = self.cache.get(url)
+        if entry and entry.age() < self.cache.fresh_for:
+            self.cache.record_hit()
+            self.metrics.count("cache_hits")
+            return entry.to_response()
+
+        response = self.get_with_retries(
+            url, entry.conditional_headers() if entry else None
+        )
+        if response.status_code == 304 and entry:
+            self.cache.touch(entry)
+            self.cache.record_hit(revalidated=True)
+            self.metrics.count("cache_revalidated")
+            return entry.to_response()
+        if response.status_code == 200:
+            self.cache.put(url, response)
+        return response
+
+    def get_with_retries(self, url, headers=None):
+        """GETs url, retrying connection errors, timeouts and retryable statuses with backoff
+
+        Raises the last error (requests.HTTPError for a status) once retries are used up.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.request(url, headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                log.info(f"{e.__class__.__name__} for {url}, retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                retry_after = retry_after_seconds(response)
+                delay = min(
+                    self.max_backoff,
+                    self.backoff(attempt) if retry_after is None else retry_after,
+                )
+                log.info(f"{response.status_code} for {url}, retrying in {delay:.1f}s")
+            self.metrics.count("retries")
+            sleep(delay)
+
+    def close(self):
+        self.session.close()
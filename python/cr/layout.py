@@ -0,0 +1,159 @@
+"""Where the daily files of an archive directory live: flat, or sharded by chamber, year and month
+
+The flat layout keeps every H<date>.txt and S<date>.txt in the directory itself. The sharded
+layout keeps them under <chamber>/<year>/<month>/, e.g. S/2010/01/S2010-01-02.txt, and each
+month has an index.json of its days:
+
+    {"2010-01-02": {"file": "S2010-01-02.txt", "sha256": "...", "size": 12345}}
+
+so a date range is enumerated by reading only the indexes of its months, without listing or
+statting the files. Move a flat archive into shards with:
+
+    python -m cr.layout DIRECTORY
+"""
+
+import argparse
+import json
+import os
+import threading
+
+from cr.archive import file_hash, shard_directory, write_atomic
+from cr.manifest import FILENAME_REGEX, day_of_file
+
+
+def in_range(key, start, end):
+    """True if key (a date string or a prefix of one) falls between start and end dates"""
+    return (start is None or key >= start[: len(key)]) and (
+        end is None or key <= end[: len(key)]
+    )
+
+
+class FlatLayout:
+    """Every daily file directly in directory, as CRWriter has always saved them"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, chamber, day):
+        """Path of chamber's uncompressed daily file for day"""
+        return self.directory + "/" + chamber.upper() + str(day) + ".txt"
+
+    def record(self, file_path):
+        """Nothing to index in a flat directory"""
+        pass
+
+    def days(self, chamber, start=None, end=None):
+        """(date, path) of chamber's files from start to end (inclusive), listing the directory"""
+        start, end = start and str(start), end and str(end)
+        found = []
+        for name in os.listdir(self.directory):
+            match = FILENAME_REGEX.match(name)
+            if match and match.group(1) == chamber.upper():
+                if in_range(match.group(2), start, end):
+                    found.append((match.group(2), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def files(self, start=None, end=None, chambers="HS"):
+        """Paths of the daily files from start to end, sorted by (date, chamber)"""
+        days = [
+            (day, chamber, path)
+            for chamber in chambers
+            for day, path in self.days(chamber, start, end)
+        ]
+        return [path for day, chamber, path in sorted(days)]
+
+
+class ShardedLayout(FlatLayout):
+    """Daily files in <chamber>/<year>/<month>/ shards of directory, each with an index.json"""
+
+    index_name = "index.json"
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self._lock = threading.Lock()
+
+    def path(self, chamber, day):
+        name = chamber.upper() + str(day) + ".txt"
+        return os.path.join(shard_directory(self.directory, chamber, day), name)
+
+    def read_index(self, shard):
+        try:
+            with open(os.path.join(shard, self.index_name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def write_index(self, shard, index):
+        path = os.path.join(shard, self.index_name)
+        write_atomic(path, json.dumps(index, indent=1, sort_keys=True))
+
+    def record(self, file_path):
+        """Adds a daily file just saved in its shard to the shard's index"""
+        chamber, day = day_of_file(file_path)
+        entry = {
+            "file": os.path.basename(file_path),
+            "size": os.path.getsize(file_path),
+            "sha256": file_hash(file_path),
+        }
+        shard = os.path.dirname(file_path)
+        with self._lock:
+            index = self.read_index(shard)
+            index[day] = entry
+            self.write_index(shard, index)
+
+    def days(self, chamber, start=None, end=None):
+        """(date, path) of chamber's files from start to end (inclusive), from the month indexes"""
+        start, end = start and str(start), end and str(end)
+        chamber_directory = os.path.join(self.directory, chamber.upper())
+        if not os.path.isdir(chamber_directory):
+            return []
+        found = []
+        for year in sorted(os.listdir(chamber_directory)):
+            if not in_range(year, start, end):
+                continue
+            for month in sorted(os.listdir(os.path.join(chamber_directory, year))):
+                if not in_range(f"{year}-{month}", start, end):
+                    continue
+                shard = os.path.join(chamber_directory, year, month)
+                for day, entry in sorted(self.read_index(shard).items()):
+                    if in_range(day, start, end):
+                        found.append((day, os.path.join(shard, entry["file"])))
+        return found
+
+    @classmethod
+    def detect(cls, directory):
+        """True if directory holds a sharded archive"""
+        return any(os.path.isdir(os.path.join(directory, c)) for c in "HS")
+
+    def migrate(self, flat_directory=None):
+        """Moves the daily files of a flat directory (by default this one) into indexed shards"""
+        flat = FlatLayout(flat_directory or self.directory)
+        moved = 0
+        for path in flat.files():
+            chamber, day = day_of_file(path)
+            suffix = os.path.basename(path)[len(chamber + day + ".txt") :]
+            target = self.path(chamber, day) + suffix
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+            self.record(target)
+            moved += 1
+        return moved
+
+
+# Layouts by name
+LAYOUTS = {"flat": FlatLayout, "sharded": ShardedLayout}
+
+
+def open_layout(directory):
+    """The layout of an existing archive directory"""
+    if ShardedLayout.detect(directory):
+        return ShardedLayout(directory)
+    return FlatLayout(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", type=str, help="flat archive to move into shards")
+    args = parser.parse_args()
+    moved = ShardedLayout(args.directory).migrate()
+    print(f"Moved {moved} files into shards of {args.directory}")
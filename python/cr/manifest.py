@@ -0,0 +1,188 @@
+"""Persistent record of which days have been scraped for each chamber"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+from cr.archive import write_atomic
+
+log = logging.getLogger(__name__)
+
+# Daily file names, uncompressed or with a cr.archive compression suffix
+FILENAME_REGEX = re.compile(r"^([HS])(\d{4}-\d{2}-\d{2})\.txt(?:\.gz|\.zst)?$")
+
+
+def parse_day(day):
+    return datetime.strptime(day, "%Y-%m-%d").date()
+
+
+def day_of_file(file_path):
+    """Returns (chamber, date) from a daily file name, e.g. ("S", "2010-01-02")"""
+    match = FILENAME_REGEX.match(os.path.basename(file_path))
+    if not match:
+        raise ValueError(f"Not a daily Congressional Record file: {file_path}")
+    return match.group(1), match.group(2)
+
+
+class ScrapeManifest:
+    """JSON manifest kept in the output directory next to the scraped files
+
+    For each chamber it records the days fetched (with a hash of their content), the days that
+    had no content, the days that failed, the days started but not finished (e.g. by a run that
+    was killed) and the latest day seen, so the daily job never has to list the directory.
+    The Record is published with a lag, so a day that is empty when checked is only trusted as
+    a recess day once it was checked settle_days after the fact.
+
+    Records are saved every save_every changes rather than each time, since every save rewrites
+    the whole file; call flush at the end of a run. Each save is a consistent snapshot, so a
+    day recorded in it as fetched never hides an earlier day that was still in flight.
+    """
+
+    filename = "manifest.json"
+    settle_days = 3
+
+    def __init__(self, directory, save_every=50):
+        """
+        : param directory: directory of the scraped files the manifest is kept in
+        : param save_every: changes recorded in memory before the file is rewritten
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, self.filename)
+        self.save_every = save_every
+        # Changes since the last save
+        self.unsaved = 0
+        self._lock = threading.RLock()
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                self.chambers = json.load(f)
+        else:
+            self.chambers = {}
+
+    def chamber(self, house):
+        entry = self.chambers.setdefault(
+            house.upper(), {"latest": None, "fetched": {}, "empty": {}, "failed": {}}
+        )
+        # Manifests written before days were marked as started don't have the key
+        entry.setdefault("started", {})
+        return entry
+
+    def update_latest(self, entry, day):
+        if entry["latest"] is None or str(day) > entry["latest"]:
+            entry["latest"] = str(day)
+
+    def record_fetched(self, house, day, content):
+        """Marks day as fetched and returns the content hash"""
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self.chamber(house)
+            entry["fetched"][str(day)] = content_hash
+            entry["empty"].pop(str(day), None)
+            entry["failed"].pop(str(day), None)
+            entry["started"].pop(str(day), None)
+            self.update_latest(entry, day)
+            self.changed()
+        return content_hash
+
+    def record_empty(self, house, day, checked_on=None):
+        with self._lock:
+            entry = self.chamber(house)
+            entry["empty"][str(day)] = str(checked_on or date.today())
+            entry["failed"].pop(str(day), None)
+            entry["started"].pop(str(day), None)
+            self.update_latest(entry, day)
+            self.changed()
+
+    def record_failed(self, house, day, error):
+        with self._lock:
+            entry = self.chamber(house)
+            entry["failed"][str(day)] = str(error)
+            entry["started"].pop(str(day), None)
+            self.changed()
+
+    def record_started(self, house, day):
+        """Marks day as requested; it stays to be retried until its outcome is recorded
+
+        With several days in flight a later day can finish before an earlier one, so a run that
+        is killed can leave days before latest that were never fetched.
+        """
+        with self._lock:
+            entry = self.chamber(house)
+            entry["started"][str(day)] = str(date.today())
+            self.changed()
+
+    def is_known_empty(self, house, day):
+        """True if day had no content when checked at least settle_days after it"""
+        checked_on = self.chamber(house)["empty"].get(str(day))
+        if checked_on is None:
+            return False
+        return (parse_day(checked_on) - day).days >= self.settle_days
+
+    def is_done(self, house, day):
+        """True if day never needs to be requested again"""
+        return str(day) in self.chamber(house)["fetched"] or self.is_known_empty(
+            house, day
+        )
+
+    def days_to_retry(self, house):
+        """Failed and unfinished days plus empty days that may not have been published yet"""
+        entry = self.chamber(house)
+        unsettled = [
+            parse_day(d)
+            for d in entry["empty"]
+            if not self.is_known_empty(house, parse_day(d))
+        ]
+        unfinished = [
+            parse_day(d) for d in list(entry["failed"]) + list(entry["started"])
+        ]
+        return sorted(unfinished + unsettled)
+
+    def next_start_date(self, house):
+        """First day the next run has to look at, or None if nothing is known for house"""
+        latest = self.chamber(house)["latest"]
+        candidates = self.days_to_retry(house)
+        if latest is not None:
+            candidates.append(parse_day(latest) + timedelta(1))
+        return min(candidates) if candidates else None
+
+    def bootstrap(self, house, days=None):
+        """Records house's files already in the directory, once, for archives without a manifest
+
+        : param days: dates (Y-m-d) of house's files, for an archive whose files are not all
+            directly in the directory; by default the directory is listed
+        """
+        if days is None:
+            days = []
+            for name in os.listdir(self.directory):
+                match = FILENAME_REGEX.match(name)
+                if match and match.group(1) == house.upper():
+                    days.append(match.group(2))
+        with self._lock:
+            entry = self.chamber(house)
+            for day in days:
+                # The hash is unknown until the day is fetched again
+                entry["fetched"].setdefault(day, None)
+                self.update_latest(entry, parse_day(day))
+            self.save()
+
+    def changed(self):
+        """Counts a change, saving once save_every have built up"""
+        with self._lock:
+            self.unsaved += 1
+            if self.unsaved >= self.save_every:
+                self.save()
+
+    def flush(self):
+        """Saves any changes not written yet"""
+        with self._lock:
+            if self.unsaved:
+                self.save()
+
+    def save(self):
+        """Writes the manifest atomically"""
+        with self._lock:
+            write_atomic(self.path, json.dumps(self.chambers, indent=1, sort_keys=True))
+            self.unsaved = 0
@@ -0,0 +1,156 @@
+"""Counters and stage timers for a scrape or parse run, reported as JSON or a Prometheus textfile
+
+Components take an optional Metrics and fall back to NULL_METRICS, whose methods do nothing, so
+instrumentation costs next to nothing when it is turned off.
+"""
+
+import json
+import re
+import threading
+from collections import defaultdict
+from time import monotonic, time
+
+from cr.archive import write_atomic
+
+
+class StageTimer:
+    """Context manager adding the time spent in its block to one stage of a Metrics"""
+
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.stage, monotonic() - self.start)
+
+
+class Metrics:
+    """Thread safe counters (e.g. bytes_fetched) and per-stage timers (e.g. parse) for one run"""
+
+    enabled = True
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        # stage -> [total seconds, calls, longest call in seconds]
+        self.timers = {}
+        self.started = time()
+        self._start = monotonic()
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def time(self, stage):
+        """Times a block: with metrics.time("parse"): ..."""
+        return StageTimer(self, stage)
+
+    def add_time(self, stage, seconds, calls=1, longest=None):
+        with self._lock:
+            timer = self.timers.setdefault(stage, [0.0, 0, 0.0])
+            timer[0] += seconds
+            timer[1] += calls
+            timer[2] = max(timer[2], seconds if longest is None else longest)
+
+    def merge(self, report):
+        """Adds the counters and timers of another run's report, e.g. from a worker process"""
+        for name, value in report["counters"].items():
+            self.count(name, value)
+        for stage, timer in report["timers"].items():
+            self.add_time(stage, timer["seconds"], timer["calls"], timer["max_seconds"])
+
+    def report(self):
+        """Returns the run's counters and timers as a JSON-ready dict"""
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed_seconds": monotonic() - self._start,
+                "counters": dict(self.counters),
+                "timers": {
+                    stage: {
+                        "seconds": seconds,
+                        "calls": calls,
+                        "mean_seconds": seconds / calls if calls else 0.0,
+                        "max_seconds": longest,
+                    }
+                    for stage, (seconds, calls, longest) in self.timers.items()
+                },
+            }
+
+    def prometheus(self, prefix="cr"):
+        """Returns the report in the Prometheus text exposition format"""
+        report = self.report()
+        lines = [
+            f"# TYPE {prefix}_run_start_timestamp_seconds gauge",
+            f"{prefix}_run_start_timestamp_seconds {report['started']}",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds {report['elapsed_seconds']}",
+        ]
+        for name, value in sorted(report["counters"].items()):
+            metric = f"{prefix}_{metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for suffix, key, kind in [
+            ("stage_seconds_total", "seconds", "counter"),
+            ("stage_calls_total", "calls", "counter"),
+            ("stage_max_seconds", "max_seconds", "gauge"),
+        ]:
+            lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+            for stage, timer in sorted(report["timers"].items()):
+                lines.append(f'{prefix}_{suffix}{{stage="{stage}"}} {timer[key]}')
+        return "\n".join(lines) + "\n"
+
+    def save(self, json_path=None, prometheus_path=None):
+        """Writes the report to whichever of json_path and prometheus_path are given
+
+        Files are replaced atomically, as the node exporter's textfile collector expects.
+        """
+        if json_path:
+            write_atomic(json_path, json.dumps(self.report(), indent=1, sort_keys=True))
+        if prometheus_path:
+            write_atomic(prometheus_path, self.prometheus())
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullMetrics(Metrics):
+    """Metrics that records nothing, used when instrumentation is off"""
+
+    enabled = False
+    timer = NullTimer()
+
+    def __init__(self):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def time(self, stage):
+        return self.timer
+
+    def add_time(self, stage, seconds, calls=1, longest=None):
+        pass
+
+    def merge(self, report):
+        pass
+
+    def save(self, json_path=None, prometheus_path=None):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
@@ -0,0 +1,240 @@
+"""Parsed days kept in an in-process LRU backed by pickles on disk, for reloading the same days
+
+    parser = CRParser.load("2010-01-04", "S", "archive")
+    parser.records, parser.speeches, parser.capture_speakers()
+
+A cached day is reused as long as its raw file and the parser configuration are unchanged. The
+raw file's size and mtime are checked first; when they differ the file is hashed, so a file that
+was only touched keeps its entry, saved with the new mtime so that it isn't hashed again.
+
+The pickles on disk are capped at max_disk_bytes: the least recently used are deleted past it,
+which also clears out days parsed with an old configuration or whose raw file is gone.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from cr.archive import file_hash, write_atomic
+from cr.parse_congressional_record import CRParser, parser_config_hash
+from cr.records import Speech
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PARSE_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "cr", "parsed"
+)
+# Rough bytes per cached row on top of its strings
+ROW_OVERHEAD = 200
+
+
+class ParsedDay:
+    """The result of CRParser.process_file for one raw file, with the fingerprint it was made from"""
+
+    def __init__(self, fingerprint, titled_speeches, records):
+        self.fingerprint = fingerprint
+        # Rows rather than Speech objects: smaller, and callers can't change them in place
+        self.titled_speeches = titled_speeches
+        self.records = records
+        self.size = sum(
+            ROW_OVERHEAD + sum(len(v) for v in row)
+            for rows in (titled_speeches, records)
+            for row in rows
+        )
+
+    def parser(self, file_path):
+        """A processed CRParser for file_path with its own copy of the speeches"""
+        parser = CRParser(file_path, stream=True)
+        parser.titled_speeches = [Speech(*row) for row in self.titled_speeches]
+        parser.records = [Speech(*row) for row in self.records]
+        return parser
+
+
+class ParseCache:
+    """LRU of parsed days bounded by max_bytes, with a pickle per day under directory"""
+
+    def __init__(
+        self,
+        directory=DEFAULT_PARSE_CACHE_DIR,
+        max_bytes=256 * 1024**2,
+        max_disk_bytes=2 * 1024**3,
+    ):
+        """
+        : param directory: where parsed days are pickled; None keeps them in memory only
+        : param max_bytes: approximate memory the in-process LRU may hold
+        : param max_disk_bytes: most bytes of pickles kept in directory
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.days = OrderedDict()
+        self.bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, file_path):
+        """Returns a processed CRParser for file_path, parsing it only if nothing cached is valid"""
+        key = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        config = parser_config_hash()
+        with self._lock:
+            day = self.days.get(key)
+            if day is not None:
+                self.days.move_to_end(key)
+        if day is not None and self.revalidate(key, day, file_path, stat, config):
+            self.memory_hits += 1
+            return day.parser(file_path)
+
+        # Another process may have parsed the new version of the file already
+        on_disk = self.read(key)
+        if on_disk is not None and self.revalidate(
+            key, on_disk, file_path, stat, config
+        ):
+            self.disk_hits += 1
+            day = on_disk
+        else:
+            self.misses += 1
+            day = self.parse(file_path, stat, config)
+            self.write(key, day)
+        self.add(key, day)
+        return day.parser(file_path)
+
+    @staticmethod
+    def is_valid(day, file_path, stat, config):
+        fingerprint = day.fingerprint
+        if fingerprint["config"] != config:
+            return False
+        if (
+            fingerprint["size"] == stat.st_size
+            and fingerprint["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return True
+        if fingerprint["sha256"] != file_hash(file_path):
+            return False
+        fingerprint.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return True
+
+    def revalidate(self, key, day, file_path, stat, config):
+        """is_valid, saving day again if its file was touched, so it isn't hashed next time"""
+        fingerprint = day.fingerprint
+        touched = (fingerprint["size"], fingerprint["mtime_ns"]) != (
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+        if not self.is_valid(day, file_path, stat, config):
+            return False
+        if touched:
+            self.write(key, day)
+        return True
+
+    @staticmethod
+    def parse(file_path, stat, config):
+        log.info(f"Parsing {file_path}")
+        parser = CRParser(file_path)
+        parser.process_file()
+        fingerprint = {
+            "config": config,
+            "sha256": file_hash(file_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        return ParsedDay(
+            fingerprint,
+            [s.row() for s in parser.titled_speeches],
+            [r.row() for r in parser.records],
+        )
+
+    def add(self, key, day):
+        """Puts day in the LRU, evicting the least recently used days beyond max_bytes"""
+        with self._lock:
+            old = self.days.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self.days[key] = day
+            self.bytes += day.size
+            while self.bytes > self.max_bytes and len(self.days) > 1:
+                _, evicted = self.days.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def pickle_path(self, key):
+        return os.path.join(
+            self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pickle"
+        )
+
+    def read(self, key):
+        if not self.directory:
+            return None
+        path = self.pickle_path(key)
+        try:
+            with open(path, "rb") as f:
+                day = pickle.load(f)
+            # Reading an entry counts as using it, see prune
+            os.utime(path)
+            return day
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A truncated or outdated pickle is just a miss
+            log.warning(
+                f"Ignoring unreadable parse cache entry for {key}", exc_info=True
+            )
+            return None
+
+    def write(self, key, day):
+        if not self.directory:
+            return
+        write_atomic(
+            self.pickle_path(key), pickle.dumps(day, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self.prune()
+
+    def prune(self):
+        """Deletes the least recently used pickles beyond max_disk_bytes; returns how many"""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".pickle"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # Another process pruned it first
+                pass
+            total -= size
+        return removed
+
+    def clear(self):
+        """Empties the in-process LRU; pickles on disk are kept"""
+        with self._lock:
+            self.days.clear()
+            self.bytes = 0
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_parse_cache():
+    """The ParseCache shared by CRParser.load calls that don't pass their own"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ParseCache()
+        return _default_cache
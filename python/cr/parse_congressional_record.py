@@ -1,85 +1,523 @@
 """Takes one file of Congressional Record scraping output and parses it into speeches"""
 import argparse
 from collections import OrderedDict
+from collections.abc import MutableMapping
+from functools import lru_cache
+from operator import is_
 import csv
+import hashlib
+import json
 import os
 import re
 import sys
 
+from cr.archive import day_file, mapped_bytes, open_text
+from cr.manifest import day_of_file
+from cr.records import Speech
+from cr.writers import AppendingTSVWriter, TSVWriter
+
 
 def check_true(x):
     return x.lower() in ("true", "yes", "t", "1")
 
 
+class TextCleaner():
+    """Replaces many strings in one pass over the text instead of one str.replace per string
+
+    The strings are compiled into one regex alternation and each match is looked up in a dict.
+    Matches are taken left to right, and of strings matching at the same position the earlier
+    one is used. The result is that of replacing the strings one after the other only when
+    their matches don't overlap and no replacement creates a new match: clean_file("ab",
+    ["b", "ab"], ["1", "2"]) gives "2" where one str.replace after the other gives "a1".
+    """
+
+    def __init__(self, strings_to_replace, replacements=None):
+        """
+        : param strings_to_replace: list of strings to replace; empty strings are ignored
+        : param replacements: optional list of strings to replace them with; if not given, replace with ''
+        """
+        if not replacements:
+            replacements = [""] * len(strings_to_replace)
+        self.table = {}
+        targets = []
+        for old, replace in zip(strings_to_replace, replacements):
+            if old and old not in self.table:
+                self.table[old] = replace
+                targets.append(old)
+        self.regex = re.compile("|".join(re.escape(t) for t in targets)) if targets else None
+        # With one replacement for every string, sub needs no lookup per match
+        distinct = set(self.table.values())
+        if len(distinct) == 1:
+            self.replacement = distinct.pop().replace("\\", "\\\\")
+        else:
+            self.replacement = lambda m: self.table[m.group()]
+
+    def __call__(self, text):
+        if self.regex is None:
+            return text
+        return self.regex.sub(self.replacement, text)
+
+    def iter_clean(self, texts):
+        """Cleans texts one at a time, e.g. the pages of iter_pages, so it can be chained into a stream"""
+        for text in texts:
+            yield self(text)
+
+
+@lru_cache(maxsize=32)
+def text_cleaner(strings_to_replace, replacements):
+    return TextCleaner(strings_to_replace, replacements)
+
+
 def clean_file(file_text, strings_to_replace, replacements=None):
     """Cleans text by replacing strings_to_replace with replacements or with '' if replacements is not given
 
+    All strings are replaced in a single pass; see TextCleaner.
+
     : param file_text: string of text to clean
     : param strings_to_remove: list of strings to replace
     : param replacements: optional list of strings to replace; if not given, replace with '' 
     """
+    cleaner = text_cleaner(tuple(strings_to_replace), tuple(replacements or ()))
+    return(cleaner(file_text))
 
-    if not replacements:
-        replacements = [""] * len(strings_to_replace)
-    for old, replace in zip(strings_to_replace, replacements):
-        file_text = file_text.replace(old, replace)
-    return(file_text)
 
-
-PAGE_BREAK_INDICATOR = "\[[\'\"](\\\\n)+\[[\'\"], <a href=[\'\"]/congressional-record/volume-\d+/(?:senate|house)-section/page/[SH][SH0-9\-]+[\'\"]>Pages? [HS][0-9\-HS]+</a>, u?[\'\"]\]\\\\nFrom the Congressional Record Online through the Government Publishing Office \[www\.gpo\.gov\]"
-TITLE_INDICATOR = "^[\\\\n\s]*([A-Z0-9][A-Z0-9a-z \.,\-!\?:n]+)\n*"
+PAGE_BREAK_INDICATOR = r"""\[['"](?:\\n)+\[['"], <a href=['"]/congressional-record/volume-\d+/(?:senate|house)-section/page/[SH][SH0-9\-]+['"]>Pages? (?P<pages>[HS][0-9\-HS]+)</a>, u?['"]\]\\nFrom the Congressional Record Online through the Government Publishing Office \[www\.gpo\.gov\]"""
+TITLE_INDICATOR = r"^[\\n\s]*([A-Z0-9][A-Z0-9a-z \.,\-!\?:n]+)\n*"
 SPEAKER_INDICATORS = [
-    "(The PRESIDING OFFICER\.)",
-    "(The ACTING PRESIDENT pro tempore)\.",
-    "((Mr|Ms|Mrs)\.([A-Zace'\-]+)( [A-Z]+)?)\."
+    r"(The PRESIDING OFFICER\.)",
+    r"(The ACTING PRESIDENT pro tempore)\.",
+    r"((Mr|Ms|Mrs)\. ([A-Zace'\-]+)( [A-Z]+)?)\."
 ]
+# Page markers inside a page, e.g. [[Page S2]]
+INNER_PAGE_INDICATOR = r"""<a href=['"][^'"]*['"]>Pages? ([HS][0-9\-HS]+)</a>, u?['"]\]\]"""
+# Speeches starting like this carry on from the previous speaker
+CONTINUATION_INDICATOR = r"(?:Mr\.|Madam) (?:President|Speaker)\b"
 NON_SPEECH_TITLES = []
+# Bump when a code change alters what a daily file parses to, so fingerprinted days are parsed again
+PARSER_VERSION = 2
+
+# Compiled once at import so per-page work doesn't go through re's pattern cache
+PAGE_BREAK_REGEX = re.compile(PAGE_BREAK_INDICATOR)
+TITLE_REGEX = re.compile(TITLE_INDICATOR)
+INNER_PAGE_REGEX = re.compile(INNER_PAGE_INDICATOR)
+# All speaker indicators in one alternation, only at the start of a speech or of a paragraph
+# (a newline, escaped or not, followed by the two space indent)
+SPEAKER_REGEX = re.compile(
+    r"(?:^|(?<=\n  )|(?<=\\n  ))(?:" + "|".join(f"(?:{p})" for p in SPEAKER_INDICATORS) + ")"
+)
+CONTINUATION_REGEX = re.compile(CONTINUATION_INDICATOR)
+# Whitespace and escaped newlines (a backslash then n) that a speech may still start with
+LEADING_BLANK_REGEX = re.compile(r"(?:\s|\\n)*")
+# Byte patterns for memory-mapped files. The title pattern drops its ^, which never matches at a
+# nonzero pos, since pattern.match(buffer, start) anchors at start anyway.
+PAGE_BREAK_BYTES_REGEX = re.compile(PAGE_BREAK_INDICATOR.encode())
+TITLE_BYTES_REGEX = re.compile(TITLE_INDICATOR[1:].encode())
+BLANK_BYTES_REGEX = re.compile(rb"\s+")
+
+# Size of each read when streaming a file
+READ_CHUNK_SIZE = 1 << 16
+# Upper bound on the length of one page break; a streamed match is only trusted once this much text follows its start
+MAX_PAGE_BREAK_LENGTH = 4096
+
+
+def parser_config_hash():
+    """Hash of the parser version and the patterns that decide what a daily file parses to"""
+    config = [PARSER_VERSION, PAGE_BREAK_INDICATOR, TITLE_INDICATOR, SPEAKER_INDICATORS,
+              INNER_PAGE_INDICATOR, CONTINUATION_INDICATOR]
+    return hashlib.sha256(json.dumps(config).encode("utf-8")).hexdigest()
+
+
+def split_labeled_chunks(chunks, page_break_regex=PAGE_BREAK_REGEX,
+                         max_break_length=MAX_PAGE_BREAK_LENGTH):
+    """Yields (label, text) for the text between page breaks from an iterable of text chunks
+
+    Only keeps the current page (plus one chunk) in memory. label is the "pages" group of
+    the page break before the text, or "" for the text before the first break.
+
+    : param chunks: iterable of strings, e.g. successive reads of a file
+    : param page_break_regex: pattern (string or compiled) separating pages
+    : param max_break_length: longest possible page break match
+    """
+    pattern = re.compile(page_break_regex)
+
+    def label_of(m):
+        return m.groupdict().get("pages") or ""
+
+    buffer = ""
+    label = ""
+    # Position in buffer before which no new match can start
+    scan_from = 0
+    for chunk in chunks:
+        buffer += chunk
+        page_start = 0
+        for m in pattern.finditer(buffer, scan_from):
+            # A match this close to the end could still change once more text arrives
+            if m.start() + max_break_length > len(buffer):
+                break
+            yield label, buffer[page_start:m.start()]
+            label = label_of(m)
+            page_start = m.end()
+            scan_from = m.end()
+        buffer = buffer[page_start:]
+        scan_from = max(scan_from - page_start, len(buffer) - max_break_length, 0)
+
+    page_start = 0
+    for m in pattern.finditer(buffer, scan_from):
+        yield label, buffer[page_start:m.start()]
+        label = label_of(m)
+        page_start = m.end()
+    yield label, buffer[page_start:]
+
+
+def split_chunks(chunks, page_break_regex=PAGE_BREAK_REGEX,
+                 max_break_length=MAX_PAGE_BREAK_LENGTH):
+    """Yields the text between page breaks from an iterable of text chunks
+
+    Gives the same pages as re.split over the joined text (ignoring groups), but only keeps the
+    current page (plus one chunk) in memory.
+    """
+    for label, page in split_labeled_chunks(chunks, page_break_regex, max_break_length):
+        yield page
 
 
-class CRParser():
-    def __init__(self, file_path):
-        """Define a congressional record parser"""
+def iter_page_spans(buffer, page_break_regex=PAGE_BREAK_BYTES_REGEX):
+    """Yields (label, start, end) offsets of the text between page breaks in a bytes-like buffer
 
-    # Nested dictionary of title -> speaker -> speeches
-        self.speeches = OrderedDict()
-        self.record = OrderedDict()
+    Gives the same pages as split_labeled_chunks over the decoded text, without copying them.
+    """
+    label = ""
+    start = 0
+    for m in page_break_regex.finditer(buffer):
+        yield label, start, m.start()
+        label = (m.group("pages") or b"").decode("ascii")
+        start = m.end()
+    yield label, start, len(buffer)
+
+
+def parse_page_span(buffer, start, end, title_regex=TITLE_BYTES_REGEX):
+    """Returns (title, text start) for the page at buffer[start:end], or None for a blank page
+
+    The byte offset counterpart of parse_page.
+    """
+    if BLANK_BYTES_REGEX.fullmatch(buffer, start, end):
+        return None
+    m = title_regex.match(buffer, start, end)
+    if m:
+        return m.group(1).decode("utf-8"), m.end()
+    return "", start
 
-        with open(file_path) as f:
-            self.congressional_record_text = f.read()
 
-    def split_pages(self, page_break_regex=PAGE_BREAK_INDICATOR):
-        self.congressional_record_pages = re.split(
-            page_break_regex, self.congressional_record_text)
+def page_range(label, page):
+    """Returns the pages a page of text covers, e.g. "S1" or "S1-S3"
 
-    def capture_title(self, page, title_regex=TITLE_INDICATOR):
-        if not re.match(title_regex, page):
-            title = ""
+    : param label: label of the page break before the page
+    : param page: page text, which may hold further page markers
+    """
+    pages = [p for p in label.split("-") if p]
+    for m in INNER_PAGE_REGEX.finditer(page):
+        pages.extend(p for p in m.group(1).split("-") if p)
+    if not pages:
+        return ""
+    return pages[0] if pages[0] == pages[-1] else f"{pages[0]}-{pages[-1]}"
+
+
+def parse_page(page, title_regex=TITLE_REGEX):
+    """Returns (title, text) for one page from a single title match, or None for a blank page
+
+    Equivalent to capture_title, the blank page check and remove_title in one pass; title is ""
+    when the page doesn't start with one.
+    """
+    # Pages that are only whitespace carry no speech; the empty string is still kept
+    if page.isspace():
+        return None
+    m = title_regex.match(page)
+    if m:
+        return m.group(1), page[m.end():]
+    return "", page
+
+
+def strip_text(text):
+    """Strips whitespace and escaped newlines (a backslash then n) from both ends of text"""
+    text = text.strip()
+    while text.startswith("\\n"):
+        text = text[2:].lstrip()
+    while text.endswith("\\n"):
+        text = text[:-2].rstrip()
+    return text
+
+
+def segment_speakers(speech, previous_speaker="", speaker_regex=SPEAKER_REGEX):
+    """Yields (speaker, text) for each stretch of a speech in one scan of the speaker alternation
+
+    Text before the first speaker belongs to previous_speaker if it starts like a continuation
+    ("Mr. President, ..."), otherwise to no speaker ("").
+    """
+    text_start = LEADING_BLANK_REGEX.match(speech).end()
+    speaker = previous_speaker if CONTINUATION_REGEX.match(speech, text_start) else ""
+    position = 0
+    for m in speaker_regex.finditer(speech):
+        text = strip_text(speech[position:m.start()])
+        if text:
+            yield speaker, text
+        # The first group that took part in the match is the whole name for its indicator
+        speaker = next(g for g in m.groups() if g is not None).rstrip(".")
+        position = m.end()
+    text = strip_text(speech[position:])
+    if text or position:
+        yield speaker, text
+
+
+def iter_speaker_records(speeches):
+    """Turns (title, speech) pairs in document order into (title, speaker, text) records
+
+    (title, pages, speech) triples give (title, speaker, pages, text) records.
+    """
+    speaker = ""
+    for title, *details, speech in speeches:
+        for speaker, text in segment_speakers(speech, speaker):
+            yield (title, speaker, *details, text)
+
+
+def read_chunks(file_path, chunk_size=READ_CHUNK_SIZE):
+    """Yields successive chunks of a text file, decompressing gzip or zstd files as they are read"""
+    with open_text(file_path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class SpeechesView(MutableMapping):
+    """title -> speech texts in order of first appearance, over a parser's titled_speeches
+
+    Built once and kept by the parser until titled_speeches is replaced, or a speech is added to,
+    removed from or replaced in it outside the view; changes to a speech's fields in place are
+    not noticed. Assigning or deleting a title's speeches changes titled_speeches, the assigned
+    speeches keeping the pages of those they replace; the lists returned are copies, so change
+    them by assigning.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.source = parser.titled_speeches
+        self.texts = OrderedDict()
+        # The Speech objects in the view, to notice changes to source behind its back
+        self.speeches = []
+        for speech in self.source:
+            self.add(speech)
+
+    def add(self, speech):
+        self.texts.setdefault(speech.title, []).append(speech.text)
+        self.speeches.append(speech)
+
+    def is_current(self):
+        """True if titled_speeches is still the list the view was built from, holding the same speeches"""
+        source = self.parser.titled_speeches
+        return (source is self.source and len(source) == len(self.speeches)
+                and all(map(is_, source, self.speeches)))
+
+    def __getitem__(self, title):
+        return list(self.texts[title])
+
+    def __setitem__(self, title, texts):
+        parser = self.parser
+        # Each new speech keeps the pages of the one it replaces; any extra, those of the last
+        pages = [s.pages for s in self.source if s.title == title] or [""]
+        speeches = [Speech(parser.date, parser.chamber, title, "", pages[min(i, len(pages) - 1)], text)
+                    for i, text in enumerate(texts)]
+        # The new speeches take the place of the title's first speech, keeping the view's order
+        kept = [s for s in self.source if s.title != title]
+        position = next((i for i, s in enumerate(self.source) if s.title == title), len(kept))
+        self.source = kept[:position] + speeches + kept[position:]
+        self.speeches = list(self.source)
+        parser.titled_speeches = self.source
+        if speeches:
+            self.texts[title] = [s.text for s in speeches]
         else:
-            title = re.match(title_regex, page).group(1)
-        return(title)
+            self.texts.pop(title, None)
+
+    def __delitem__(self, title):
+        if title not in self.texts:
+            raise KeyError(title)
+        self[title] = []
+
+    def __iter__(self):
+        return iter(self.texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __repr__(self):
+        return f"SpeechesView({dict(self.texts)!r})"
 
-    def remove_title(self, page):
-        return(re.sub(TITLE_INDICATOR, "", page))
 
-    def add_speech_to_collection(self, title, speech):
-        if title in self.speeches.keys():
-            self.speeches[title].append(speech)
+class CRParser():
+    def __init__(self, file_path, stream=False, memory_map=False):
+        """Define a congressional record parser
+
+        : param file_path: file of scraper output, which may be compressed (see cr.archive)
+        : param stream: if True, the file is never read whole; use iter_pages or iter_speeches
+        : param memory_map: if True, iter_speeches and iter_records find pages and titles in a
+            memory map of the file and only decode the text of each page; implies stream
+        """
+
+        self.record = OrderedDict()
+        self.file_path = file_path
+        try:
+            self.chamber, self.date = day_of_file(file_path)
+        except ValueError:
+            self.chamber, self.date = "", ""
+        self.congressional_record_text = None
+        self.congressional_record_pages = None
+        # Page break label before each of congressional_record_pages
+        self.page_labels = None
+        # Speech per page in document order, without speakers until match_speakers
+        self.titled_speeches = []
+        self._speeches_view = None
+        # Speech per speaker's stretch of text in document order, filled by match_speakers
+        self.records = []
+        # Pages yielded so far by iter_labeled_pages
+        self.pages_split = 0
+        self.memory_map = memory_map
+
+        if not (stream or memory_map):
+            with open_text(file_path) as f:
+                self.congressional_record_text = f.read()
+
+    @classmethod
+    def from_text(cls, text, file_path):
+        """Parser for scraper output already in memory; file_path names the day it came from"""
+        parser = cls(file_path, stream=True)
+        parser.congressional_record_text = text
+        return parser
+
+    @classmethod
+    def load(cls, date, chamber, directory, cache=None):
+        """Processed parser for one day of an archive, reused from a cache while its file is unchanged
+
+        Repeat loads skip reading and parsing the file; see cr.parse_cache.
+
+        : param date: a date or "YYYY-MM-DD"
+        : param chamber: "H" or "S"
+        : param directory: directory of daily files, which may be compressed
+        : param cache: ParseCache to use; defaults to one shared by the process
+        """
+        # cr.parse_cache imports this module
+        from cr.parse_cache import default_parse_cache
+        cache = cache or default_parse_cache()
+        return cache.get(day_file(directory, chamber, date))
+
+    def split_pages(self, page_break_regex=PAGE_BREAK_REGEX):
+        labeled_pages = list(split_labeled_chunks([self.congressional_record_text], page_break_regex))
+        self.page_labels = [label for label, page in labeled_pages]
+        self.congressional_record_pages = [page for label, page in labeled_pages]
+
+    def iter_labeled_pages(self, page_break_regex=PAGE_BREAK_REGEX):
+        """Yields (page break label, page) one at a time, reading the file incrementally if it wasn't read up front"""
+        if self.congressional_record_text is not None:
+            chunks = [self.congressional_record_text]
         else:
-            self.speeches[title] = [speech]
+            chunks = read_chunks(self.file_path)
+        for labeled_page in split_labeled_chunks(chunks, page_break_regex):
+            self.pages_split += 1
+            yield labeled_page
 
-    def add_titled_speeches_to_collection(self):
-        """Add speeches to collection, pulling out title if relevant"""
-        # self.split_pages()
+    def iter_pages(self, page_break_regex=PAGE_BREAK_REGEX):
+        """Yields pages one at a time, reading the file incrementally if it wasn't read up front"""
+        return (page for label, page in self.iter_labeled_pages(page_break_regex))
+
+    def capture_title(self, page, title_regex=TITLE_REGEX):
+        m = re.match(title_regex, page)
+        return(m.group(1) if m else "")
 
-        for page in self.congressional_record_pages:
-            title = self.capture_title(page)
+    def remove_title(self, page):
+        return(TITLE_REGEX.sub("", page))
+
+    @property
+    def speeches(self):
+        """title -> speeches in order of first appearance, a SpeechesView of titled_speeches"""
+        view = self._speeches_view
+        if view is None or not view.is_current():
+            view = self._speeches_view = SpeechesView(self)
+        return view
+
+    def add_speech_to_collection(self, title, speech, pages=""):
+        view = self._speeches_view
+        view_is_current = view is not None and view.is_current()
+        record = Speech(self.date, self.chamber, title, "", pages, speech)
+        self.titled_speeches.append(record)
+        if view_is_current:
+            view.add(record)
+
+    def iter_titled_pages(self, pages):
+        """Yields (title, text) for each page that isn't empty, pulling out title if relevant"""
+        for page in pages:
+            parsed = parse_page(page)
             # Don't bother with empty text
-            if not re.match("^\s+$", page):
-                if title:
-                    page_text = self.remove_title(page)
-                    self.add_speech_to_collection(title, page_text)
-                else:
-                    self.add_speech_to_collection("", page)
+            if parsed is not None:
+                yield parsed
+
+    def add_titled_speeches_to_collection(self):
+        """Add speeches to collection, pulling out title if relevant"""
+        if self.congressional_record_pages is None:
+            labeled_pages = self.iter_labeled_pages()
+        else:
+            labeled_pages = zip(self.page_labels, self.congressional_record_pages)
+
+        for label, page in labeled_pages:
+            parsed = parse_page(page)
+            if parsed is not None:
+                title, page_text = parsed
+                self.add_speech_to_collection(title, page_text, page_range(label, page))
+
+    def iter_mapped_pages(self):
+        """Yields (title, page break label, text) for each page that isn't empty, from a memory map
+
+        Pages and titles are found as byte offsets; only the text after the title is decoded.
+        """
+        with mapped_bytes(self.file_path) as buffer, memoryview(buffer) as view:
+            for label, start, end in iter_page_spans(buffer):
+                self.pages_split += 1
+                parsed = parse_page_span(buffer, start, end)
+                if parsed is not None:
+                    title, text_start = parsed
+                    yield title, label, str(view[text_start:end], "utf-8")
+
+    def iter_speeches(self):
+        """Yields cleaned (title, speech) pairs one page at a time without building self.speeches"""
+        if self.memory_map and self.congressional_record_text is None:
+            for title, label, page_text in self.iter_mapped_pages():
+                yield title, self.clean_speech(page_text)
+            return
+        pages = self.congressional_record_pages
+        if pages is None:
+            pages = self.iter_pages()
+
+        for title, page_text in self.iter_titled_pages(pages):
+            yield title, self.clean_speech(page_text)
+
+    def iter_page_speeches(self):
+        """Yields cleaned (title, pages, speech) triples one page at a time"""
+        if self.memory_map and self.congressional_record_text is None:
+            for title, label, page_text in self.iter_mapped_pages():
+                # The title can't hold a page marker, so the text alone gives the page range
+                yield title, page_range(label, page_text), self.clean_speech(page_text)
+            return
+        for label, page in self.iter_labeled_pages():
+            parsed = parse_page(page)
+            if parsed is not None:
+                title, page_text = parsed
+                yield title, page_range(label, page), self.clean_speech(page_text)
+
+    def iter_records(self, with_pages=False):
+        """Yields (title, speaker, text) records one page at a time
+
+        : param with_pages: yield (title, speaker, pages, text) records instead
+        """
+        if with_pages:
+            return iter_speaker_records(self.iter_page_speeches())
+        return iter_speaker_records(self.iter_speeches())
 
     # Let's not pull out votes. Let's do that in a deeper parsing script.
 
@@ -98,46 +536,41 @@ class CRParser():
     #         del self.speeches["EXECUTIVE_SESSION"]
 
     def print_speakers(self):
-        # To start with, capture everything up to the second \. and print it out
-        for title in self.speeches.keys():
-            for speech in self.speeches[title]:
-
-                match = ""
-                m = re.
+        for title, speakers in self.capture_speakers().items():
+            print(f'{title}: {", ".join(speakers)}')
 
     def capture_speakers(self):
-        # For a speech, use the speaker divider and get teh speakers
-        # If a speech doesn't have a speaker, it seems like, if it starts with "Mr President"
-        # or "Madam President", it still has a speaker but it's a continuation of the previous speech's speaker
-
-        # To start with, capture everything up to the second \. and print it out
-        for title in self.speeches.keys():
-            for speech in self.speeches[title]:
-
-                match = ""
-                m = re.
+        """Returns title -> speakers in order of first appearance; "" stands for text with no speaker"""
+        speakers = OrderedDict()
+        for record in self.records:
+            title_speakers = speakers.setdefault(record.title, [])
+            if record.speaker not in title_speakers:
+                title_speakers.append(record.speaker)
+        return speakers
 
     def match_speakers(self):
-        """Match for speakers and mark speakers; pull out speeches w/ no speakers
-        Update self.speeches so they have both titles and speakers
-        Update self.other to include text from pages with no speaker"""
-        pass
+        """Match for speakers and mark speakers
+        Update self.records with a Speech for each speaker's stretch of text in titled_speeches.
+        If a speech doesn't have a speaker but starts with "Mr. President" or "Madam President",
+        it is a continuation of the previous speaker; otherwise its speaker is ""."""
+        speeches = ((s.title, s.pages, s.text) for s in self.titled_speeches)
+        self.records = [Speech(self.date, self.chamber, title, speaker, pages, text)
+                        for title, speaker, pages, text in iter_speaker_records(speeches)]
 
     def pull_out_record(self):
         """Pull out text entered into record from speeches and add to other"""
         # Also need to clean up extra spaces and \n
         pass
 
+    def clean_speech(self, speech):
+        # remove double \n\n to start speeches; same as re.sub('^[\n\s]+', '', speech)
+        return speech.lstrip()
+
     def clean_speeches(self):
-        # remove double \n\n to start speeches
-        replacement = OrderedDict()
-        for title in self.speeches.keys():
-            speeches = []
-            for speech in self.speeches[title]:
-                s = re.sub('^[\n\s]+', '', speech)
-                speeches.append(s)
-            replacement[title] = speeches
-        self.speeches = replacement
+        """Cleans the text of titled_speeches in place"""
+        for speech in self.titled_speeches:
+            speech.text = self.clean_speech(speech.text)
+        self._speeches_view = None
 
     # Run function for processing 1 CR file
     def process_file(self):
@@ -147,10 +580,37 @@ class CRParser():
         # parse_executive_session_speeches() - may still need another function for parsing titles,
         # but it looks ok right now
         self.clean_speeches()
+        self.match_speakers()
 
     def write_file(self, append, speeches_path, other_path=None):
-        """Writes to files, either appending to existing files or writing to new ones"""
-        pass
+        """Writes to files, either appending to existing files or writing to new ones
+
+        Rows are (date, chamber, title, speaker, pages, text), with the date and chamber taken
+        from the daily file name, or empty if it isn't named like one. Appending replaces any
+        rows already written for that day.
+
+        : param append: add this day to existing files rather than overwriting them
+        : param speeches_path: file for the speeches
+        : param other_path: if given, text without a speaker is written here instead
+        """
+        rows = [Speech(self.date, self.chamber, title, speaker, pages, text)
+                for title, speaker, pages, text in self.iter_records(with_pages=True)]
+        write_rows(rows, self.date, self.chamber, append, speeches_path, other_path)
+
+
+def write_rows(rows, day, chamber, append, speeches_path, other_path=None):
+    """Writes one day's Speech rows as CRParser.write_file does"""
+    outputs = [(speeches_path, rows)]
+    if other_path:
+        outputs = [(speeches_path, [r for r in rows if r.speaker]),
+                   (other_path, [r for r in rows if not r.speaker])]
+    for path, path_rows in outputs:
+        if append:
+            with AppendingTSVWriter(path) as writer:
+                writer.write_day(day, chamber, path_rows)
+        else:
+            with TSVWriter(path) as writer:
+                writer.write_rows(path_rows)
 
 
 def writer_helper(speeches, text_file_path="test.tsv"):
@@ -167,10 +627,19 @@ def writer_helper(speeches, text_file_path="test.tsv"):
         f.write(text)
 
 
-def main(file_path, append, output_file):
-    parser = CRParser(file_path)
-    parser.process_file()
-    writer_helper(parser.speeches)
+def main(file_path, append, output_file, other_file=None, profile=False, **profile_options):
+    """Parses file_path into output_file
+
+    : param profile: time every stage of every page and print a report (see cr.parse_profile)
+    : param profile_options: further options of cr.parse_profile.profile_file
+    """
+    if profile:
+        # cr.parse_profile imports this module
+        from cr.parse_profile import profile_file
+        print(profile_file(file_path, append, output_file, other_file, **profile_options))
+        return
+    parser = CRParser(file_path, stream=True)
+    parser.write_file(append, output_file, other_file)
 
 
 if __name__ == "__main__":
@@ -178,11 +647,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('input_file', type=str)
     parser.add_argument('output_file', type=str)
-    parser.add_argument('append', type=bool)
+    parser.add_argument('append', type=check_true)
+    parser.add_argument('--other-file', type=str, default=None,
+                        help="write text without a speaker here instead of output_file")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each parsing stage and page and print a report")
+    parser.add_argument('--slow-page-seconds', type=float, default=0.1,
+                        help="with --profile, flag pages spending longer than this in regexes")
+    parser.add_argument('--dump-slow', type=str, default=None,
+                        help="with --profile, save each flagged page as its own daily file here")
+    parser.add_argument('--cprofile', type=str, default=None,
+                        help="with --profile, also save cProfile stats here (see pstats)")
 
     args = parser.parse_args()
+    profile_options = {}
+    if args.profile:
+        profile_options = dict(slow_page_seconds=args.slow_page_seconds,
+                               dump_directory=args.dump_slow, cprofile_path=args.cprofile)
     main(
         file_path=args.input_file,
         append=args.append,
-        output_file=args.output_file
+        output_file=args.output_file,
+        other_file=args.other_file,
+        profile=args.profile,
+        **profile_options
     )
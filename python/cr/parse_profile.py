@@ -0,0 +1,229 @@
+"""Per-stage and per-page timings of parsing one daily file, to find out why a day parses slowly
+
+    python -m cr.parse_congressional_record INPUT OUTPUT False --profile
+        [--slow-page-seconds S] [--dump-slow DIRECTORY] [--cprofile FILE]
+
+The file is parsed one page at a time as CRParser.write_file would, timing each page's page
+break, title, page marker and speaker regexes apart from cleaning, and the file's read and
+write. Pages that spend more than slow_page_seconds in the regexes are flagged, and can be saved
+as daily files of their own (page breaks included) so that the slow match can be reproduced,
+and turned into a test, on just that text.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+from time import perf_counter
+
+from cr.metrics import Metrics
+from cr.parse_congressional_record import (
+    PAGE_BREAK_REGEX,
+    CRParser,
+    page_range,
+    parse_page,
+    segment_speakers,
+    write_rows,
+)
+from cr.records import Speech
+
+log = logging.getLogger(__name__)
+
+# Per-page stages, in the order they run
+PAGE_STAGES = ("split", "title", "pages", "clean", "speakers")
+# Stages that are one regex scan of the page
+REGEX_STAGES = ("split", "title", "pages", "speakers")
+SLOW_PAGE_SECONDS = 0.1
+
+
+def milliseconds(seconds):
+    return f"{seconds * 1000:.3f}ms"
+
+
+class PageTiming:
+    """Seconds one page spent in each of PAGE_STAGES
+
+    start and end are offsets in the file's text of the page with the page breaks around it.
+    """
+
+    __slots__ = ("index", "label", "start", "end", "seconds")
+
+    def __init__(self, index, label, start, end):
+        self.index = index
+        self.label = label
+        self.start = start
+        self.end = end
+        self.seconds = dict.fromkeys(PAGE_STAGES, 0.0)
+
+    @property
+    def regex_seconds(self):
+        return sum(self.seconds[stage] for stage in REGEX_STAGES)
+
+    def describe(self):
+        stages = ", ".join(f"{s} {milliseconds(self.seconds[s])}" for s in REGEX_STAGES)
+        return (
+            f"page {self.index} ({self.label or 'no label'}, {self.end - self.start} chars): "
+            f"{milliseconds(self.regex_seconds)} in regexes ({stages})"
+        )
+
+
+class ParseProfile:
+    """Parses one daily file page by page, timing every stage of every page"""
+
+    def __init__(self, file_path, slow_page_seconds=SLOW_PAGE_SECONDS):
+        """
+        : param file_path: daily file to parse, which may be compressed
+        : param slow_page_seconds: flag pages spending longer than this in regexes
+        """
+        self.file_path = file_path
+        self.slow_page_seconds = slow_page_seconds
+        self.metrics = Metrics()
+        self.parser = None
+        self.pages = []
+        self.slow_pages = []
+
+    def timed(self, timing, stage, function, *args):
+        """Returns function(*args), adding its time to timing's stage"""
+        start = perf_counter()
+        result = function(*args)
+        timing.seconds[stage] += perf_counter() - start
+        return result
+
+    def parse(self):
+        """Returns the Speech rows CRParser.write_file would write for the file"""
+        with self.metrics.time("read"):
+            self.parser = CRParser(self.file_path)
+        parser = self.parser
+        text = parser.congressional_record_text
+        matches = PAGE_BREAK_REGEX.finditer(text)
+        rows = []
+        label, start, text_start, speaker = "", 0, 0, ""
+        while True:
+            split_start = perf_counter()
+            m = next(matches, None)
+            split_seconds = perf_counter() - split_start
+            text_end = m.start() if m else len(text)
+            timing = PageTiming(
+                len(self.pages), label, start, m.end() if m else len(text)
+            )
+            timing.seconds["split"] = split_seconds
+            page = text[text_start:text_end]
+
+            parsed = self.timed(timing, "title", parse_page, page)
+            if parsed is not None:
+                title, page_text = parsed
+                pages = self.timed(timing, "pages", page_range, label, page)
+                speech = self.timed(timing, "clean", parser.clean_speech, page_text)
+                segments = self.timed(
+                    timing, "speakers", list, segment_speakers(speech, speaker)
+                )
+                for speaker, segment in segments:
+                    rows.append(
+                        Speech(
+                            parser.date, parser.chamber, title, speaker, pages, segment
+                        )
+                    )
+            self.add_page(timing)
+            if m is None:
+                return rows
+            label = m.group("pages") or ""
+            start, text_start = m.start(), m.end()
+
+    def add_page(self, timing):
+        self.pages.append(timing)
+        for stage, seconds in timing.seconds.items():
+            self.metrics.add_time(stage, seconds)
+        if timing.regex_seconds > self.slow_page_seconds:
+            self.slow_pages.append(timing)
+            log.warning(f"Slow page in {self.file_path}: {timing.describe()}")
+
+    def write(self, rows, append, speeches_path, other_path=None):
+        """Writes rows as CRParser.write_file does, timing it"""
+        with self.metrics.time("write"):
+            write_rows(
+                rows,
+                self.parser.date,
+                self.parser.chamber,
+                append,
+                speeches_path,
+                other_path,
+            )
+
+    def dump_slow_pages(self, directory):
+        """Saves each slow page as <directory>/<day>-page<index>/<day>.txt; returns the paths"""
+        text = self.parser.congressional_record_text
+        day = self.parser.chamber + self.parser.date
+        paths = []
+        for timing in self.slow_pages:
+            page_directory = os.path.join(directory, f"{day}-page{timing.index}")
+            os.makedirs(page_directory, exist_ok=True)
+            path = os.path.join(page_directory, day + ".txt")
+            with open(path, "w") as f:
+                f.write(text[timing.start : timing.end])
+            paths.append(path)
+        return paths
+
+    def report(self, limit=10):
+        """Returns a readable summary: time per stage, then the pages slowest in regexes"""
+        timers = self.metrics.report()["timers"]
+        total = sum(timer["seconds"] for timer in timers.values())
+        lines = [
+            f"{self.file_path}: {len(self.pages)} pages in {milliseconds(total)}",
+            f"{'stage':<10}{'total':>12}{'slowest page':>14}",
+        ]
+        for stage in ("read",) + PAGE_STAGES + ("write",):
+            if stage not in timers:
+                continue
+            timer = timers[stage]
+            slowest = milliseconds(timer["max_seconds"]) if stage in PAGE_STAGES else ""
+            lines.append(
+                f"{stage:<10}{milliseconds(timer['seconds']):>12}{slowest:>14}"
+            )
+        lines.append("Slowest pages in regexes:")
+        slowest_pages = sorted(self.pages, key=lambda t: t.regex_seconds, reverse=True)
+        lines += ["  " + timing.describe() for timing in slowest_pages[:limit]]
+        lines.append(
+            f"{len(self.slow_pages)} pages over {self.slow_page_seconds}s in regexes"
+        )
+        return "\n".join(lines)
+
+
+def profile_file(
+    file_path,
+    append,
+    output_file,
+    other_file=None,
+    slow_page_seconds=SLOW_PAGE_SECONDS,
+    dump_directory=None,
+    cprofile_path=None,
+):
+    """Parses and writes file_path as cr.parse_congressional_record.main does; returns a report
+
+    : param slow_page_seconds: flag pages spending longer than this in regexes
+    : param dump_directory: if given, save each flagged page here as a daily file of its own
+    : param cprofile_path: if given, also run under cProfile, save the stats here and add the
+        top functions to the report; cProfile slows every stage down
+    """
+    profile = ParseProfile(file_path, slow_page_seconds)
+    profiler = cProfile.Profile() if cprofile_path else None
+    if profiler:
+        profiler.enable()
+    try:
+        rows = profile.parse()
+        profile.write(rows, append, output_file, other_file)
+    finally:
+        if profiler:
+            profiler.disable()
+
+    report = profile.report()
+    if dump_directory:
+        paths = profile.dump_slow_pages(dump_directory)
+        report += f"\nSaved {len(paths)} slow pages under {dump_directory}"
+    if profiler:
+        profiler.dump_stats(cprofile_path)
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(15)
+        report += "\n" + stream.getvalue()
+    return report
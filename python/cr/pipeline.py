@@ -0,0 +1,134 @@
+"""Scrapes days of the Congressional Record and parses them straight into an output writer
+
+Scraped days go through a bounded in-memory queue to a parser in the calling thread, so
+fetching, parsing and writing overlap and the raw text is only written to disk if asked for.
+"""
+
+import logging
+import queue
+import threading
+
+from cr.batch_parse import parser_rows
+from cr.parse_congressional_record import CRParser
+from cr.scrape_congressional_record import CRWriter
+
+log = logging.getLogger(__name__)
+
+# Put on the queue once the scraper is done
+DONE = object()
+
+
+class ScrapeParsePipeline:
+    """Parses the days a CRWriter scrapes and writes their rows to writer in date order
+
+    Use it as the CRWriter's sink. At most queue_size scraped days wait to be parsed; the
+    scraper blocks when the parser falls behind.
+    """
+
+    def __init__(self, writer, queue_size=4):
+        """
+        : param writer: output writer, e.g. from batch_parse.open_writer
+        : param queue_size: maximum scraped days held in memory
+        """
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.scrape_error = None
+        self.days_written = 0
+
+    def offer(self, item):
+        """Queues item, waiting for room unless the parser has stopped; True if queued"""
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def put(self, day, content):
+        """CRWriter sink; content is None for days with nothing to parse"""
+        if not self.offer((day, content)):
+            raise RuntimeError("Pipeline stopped")
+
+    def scrape(self, cr_writer, days):
+        """Runs cr_writer over days, then marks the queue done"""
+        try:
+            cr_writer.run(days)
+        except BaseException as e:
+            self.scrape_error = e
+        finally:
+            self.offer(DONE)
+
+    def run(self, cr_writer):
+        """Scrapes cr_writer's pending days in a background thread, parsing them as they arrive
+
+        cr_writer must have been created with this pipeline's put as its sink. Returns the number
+        of days written.
+
+        : param cr_writer: CRWriter for the days to scrape
+        """
+        days = cr_writer.pending_days()
+        # Days can be scraped out of order, so they are held until the days before them arrive
+        order = [d for d, _, _ in days]
+        filenames = {d: f for d, _, f in days}
+        arrived = {}
+        position = 0
+        scraper = threading.Thread(target=self.scrape, args=(cr_writer, days))
+        scraper.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is DONE:
+                    break
+                day, content = item
+                arrived[day] = content
+                while position < len(order) and order[position] in arrived:
+                    day = order[position]
+                    self.write_day(cr_writer, day, filenames[day], arrived.pop(day))
+                    position += 1
+        finally:
+            self.stopped.set()
+            scraper.join()
+        if self.scrape_error is not None:
+            raise self.scrape_error
+        return self.days_written
+
+    def write_day(self, cr_writer, day, filename, content):
+        if content is None:
+            return
+        parser = CRParser.from_text(content, filename)
+        metrics = cr_writer.metrics
+        rows = parser_rows(parser, cr_writer.house, str(day), metrics)
+        with metrics.time("write"):
+            self.writer.write_rows(rows)
+        self.days_written += 1
+        if cr_writer.manifest:
+            cr_writer.manifest.record_fetched(cr_writer.house, day, content)
+        log.info(f"Parsed {cr_writer.house} {day}")
+
+
+def run_pipeline(
+    writer, house, directory, startdate, enddate, queue_size=4, archive=False, **options
+):
+    """Scrapes house from startdate to enddate (m-d-Y) into writer; returns the days written
+
+    : param directory: where raw text is saved if archive is True
+    : param options: further CRWriter options, e.g. manifest or parallel_days
+    """
+    pipeline = ScrapeParsePipeline(writer, queue_size)
+    cr_writer = CRWriter(
+        house,
+        directory,
+        startdate,
+        enddate,
+        sink=pipeline.put,
+        archive=archive,
+        **options,
+    )
+    try:
+        return pipeline.run(cr_writer)
+    finally:
+        # The pipeline records days after the writer's own run has ended
+        if cr_writer.manifest:
+            cr_writer.manifest.flush()
@@ -0,0 +1,62 @@
+"""The speech record shared by the parser and the writers"""
+
+import sys
+
+from cr.writers import RECORD_COLUMNS
+
+
+class Speech:
+    """One stretch of a day's Record: (date, chamber, title, speaker, pages, text)
+
+    Slots keep each record to the size of a tuple, and titles and speakers are interned, so the
+    hundreds of speeches under one title share a single string. A Speech indexes, iterates and
+    unpacks like its row tuple, so any writer takes it as a row. Fields can be changed in place,
+    which is how the parser's cleaning stages work.
+    """
+
+    __slots__ = RECORD_COLUMNS
+
+    def __init__(self, date, chamber, title, speaker="", pages="", text=""):
+        self.date = date
+        self.chamber = chamber
+        self.title = sys.intern(title)
+        self.speaker = sys.intern(speaker)
+        self.pages = pages
+        self.text = text
+
+    def row(self):
+        """Returns the record as a tuple in RECORD_COLUMNS order"""
+        return (
+            self.date,
+            self.chamber,
+            self.title,
+            self.speaker,
+            self.pages,
+            self.text,
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.row()[index]
+        return getattr(self, RECORD_COLUMNS[index])
+
+    def __iter__(self):
+        return iter(self.row())
+
+    def __len__(self):
+        return len(RECORD_COLUMNS)
+
+    def __eq__(self, other):
+        if not isinstance(other, Speech):
+            return NotImplemented
+        return self.row() == other.row()
+
+    # Records are changed in place, so they can't be hashed
+    __hash__ = None
+
+    def __reduce__(self):
+        # Rebuilding through __init__ interns titles and speakers again in the receiving process
+        return Speech, self.row()
+
+    def __repr__(self):
+        return f"Speech{self.row()!r}"
@@ -1,14 +1,21 @@
 """Scrapes Senate congressional record. Input is: directory where to print the files start date: 01/01/2000 format, end date. End date defaults to current date if none given"""
 
+import argparse
 import logging
+import os
 import random
 import re
-import requests
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
 from time import sleep
 
-from bs4 import BeautifulSoup
+from cr.archive import COMPRESSION_SUFFIXES, compressed_name, open_text
+from cr.html_extract import extract_links, extract_record
+from cr.http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from cr.http_session import CRSession, RateLimiter
+from cr.layout import LAYOUTS
+from cr.metrics import Metrics
 
 log = logging.getLogger(__name__)
 
@@ -18,23 +25,29 @@ class NoCRContentException(Exception):
 
     pass
 
+
 class CRScraper:
     """Class for scraping one day's worth of content from the Congressional Record"""
 
     link_prefix = "https://www.congress.gov"
 
-    def __init__(self, url, filename):
+    def __init__(self, url, filename, max_workers=1, session=None):
+        """
+        : param url: url of the day level page
+        : param filename: file the day's content is saved to
+        : param max_workers: maximum number of section pages fetched at once; 1 fetches serially
+        : param session: CRSession shared with other scrapers; a new one is created if not given
+        """
         self.url = url
         self.output_file = filename
+        self.max_workers = max_workers
+        self.session = session or CRSession(pool_size=max(max_workers, 1))
 
     def get_links(self):
         """Gets links for one day of Congressional Record"""
-        soup = BeautifulSoup(requests.get(self.url).content)
-        links = [link for link in soup.find_all("td")]
-        # Only even numbered indexes have the needed links
-        relevant_links = [
-            links[i].a.get("href") for i in range(len(links)) if i % 2 == 0
-        ]
+        html = self.session.get(self.url).content
+        with self.session.metrics.time("html_extract"):
+            relevant_links = extract_links(html)
         # Create full links if necessary
         return [
             self.link_prefix + l if re.match("^/", l) else l for l in relevant_links
@@ -42,38 +55,115 @@ class CRScraper:
 
     def scrape_page(self, url):
         """Scrapes one section of the Congressional Record"""
-        soup = BeautifulSoup(requests.get(url).content)
-        text = soup.find("pre", class_="styled").contents
-        return "".join(str(text))
+        html = self.session.get(url).content
+        self.session.metrics.count("sections_fetched")
+        with self.session.metrics.time("html_extract"):
+            return extract_record(html)
 
     def save_file(self):
         """Writes content to file"""
         log.info("Writing to file: " + self.output_file)
-        with open(self.output_file, "w") as file:
+        # A sharded archive gets a directory for each month
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+        with open_text(self.output_file, "w") as file:
             file.write(self.content)
 
+    def scrape_pages(self, links):
+        """Scrapes all sections for the day, returning their text in the same order as links"""
+        if self.max_workers <= 1 or len(links) <= 1:
+            return [self.scrape_page(url) for url in links]
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(links))
+        ) as executor:
+            # map yields results in input order regardless of which request finishes first
+            return list(executor.map(self.scrape_page, links))
+
     def run(self):
         """Scrapes one day of Congressional Record Content"""
         links = self.get_links()
         if len(links) == 0:
             raise NoCRContentException
         else:
-            self.content = " ".join([self.scrape_page(url) for url in links])
+            self.content = " ".join(self.scrape_pages(links))
 
 
 class CRWriter:
     """Class for scraping and saving a complete time period of the Congressional Record"""
 
-    max_pause = 4
     url_prefix = "https://www.congress.gov/congressional-record/"
     url_suffix_dict = {"s": "/senate-section", "h": "/house-section"}
 
-    def __init__(self, house, directory, startdate, enddate):
+    def __init__(
+        self,
+        house,
+        directory,
+        startdate,
+        enddate,
+        max_workers=1,
+        parallel_days=1,
+        requests_per_second=None,
+        jitter=0.0,
+        timeout=(10, 60),
+        max_retries=4,
+        cache=None,
+        manifest=None,
+        sink=None,
+        archive=True,
+        compression=None,
+        metrics=None,
+        session=None,
+        layout="flat",
+    ):
+        """
+        : param max_workers: maximum number of section pages fetched at once for each day
+        : param parallel_days: number of days scraped at once
+        : param requests_per_second: request budget shared by all days; no limit if not given
+        : param jitter: maximum random extra pause in seconds after each request
+        : param timeout: connect and read timeouts in seconds for each request
+        : param max_retries: retries for each request after an error or retryable status
+        : param cache: optional ResponseCache so that re-runs only revalidate pages already fetched
+        : param manifest: optional ScrapeManifest; days it has settled are skipped, and every
+            day's outcome is recorded in it instead of failures stopping the run
+        : param sink: optional callable(day, content) handed every day's content as it is scraped,
+            and None for days without content or that failed. It then also records fetched
+            days in the manifest, once their content is safely processed.
+        : param archive: save each day's text to directory; may be turned off when there is a sink
+        : param compression: None to save plain .txt files, else "gzip" or "zstd"
+        : param metrics: optional Metrics for request, day and stage counts and timings
+        : param layout: "flat" to save every day in directory, "sharded" to save them in indexed
+            chamber/year/month shards of it (see cr.layout)
+        : param session: CRSession shared with other writers, e.g. the other chamber's; if given,
+            it is used as is and the connection, rate limit, cache and metrics options are ignored
+        """
         self.house = house.upper()
         self.url_suffix = self.url_suffix_dict[house]
         self.output_directory = directory
         self.startdate = datetime.strptime(startdate, "%m-%d-%Y").date()
         self.enddate = datetime.strptime(enddate, "%m-%d-%Y").date() + timedelta(1)
+        self.max_workers = max_workers
+        self.parallel_days = parallel_days
+        self.manifest = manifest
+        self.sink = sink
+        self.archive = archive
+        self.compression = compression
+        self.layout = LAYOUTS[layout](directory)
+        if session is None:
+            rate_limiter = (
+                RateLimiter(requests_per_second, jitter)
+                if requests_per_second
+                else None
+            )
+            # One pool of keep-alive connections for every request of the time period
+            session = CRSession(
+                timeout=timeout,
+                max_retries=max_retries,
+                pool_size=max(max_workers, 1) * max(parallel_days, 1),
+                rate_limiter=rate_limiter,
+                cache=cache,
+                metrics=metrics,
+            )
+        self.session = session
+        self.metrics = self.session.metrics
 
     def daterange(self):
         """Crates a generator over a list of dates"""
@@ -91,37 +181,262 @@ class CRWriter:
     def create_filenames(self):
         """Creates list of filenames for each day in the date range"""
         return [
-            self.output_directory + "/" + self.house + str(d) + ".txt"
+            compressed_name(self.layout.path(self.house, d), self.compression)
             for d in self.daterange()
         ]
 
-    def run(self):
-        """Scrapes and saves Congressional Record for complete time period"""
-
-        # Zip links and filenames and loop through
-        for l, f in zip(self.create_links(), self.create_filenames()):
-            # Create scraper
-            try:
-                log.info("Retrieving content for " + l)
-                s = CRScraper(l, f)
+    def run_day(self, day, link, filename):
+        """Scrapes and saves one day of the Congressional Record"""
+        self.day_started(day)
+        try:
+            log.info("Retrieving content for " + link)
+            s = CRScraper(
+                link,
+                filename,
+                max_workers=self.max_workers,
+                session=self.session,
+            )
+            with self.metrics.time("scrape_day"):
                 s.run()
-            # Catch exceptions
-            except NoCRContentException:
-                log.info("No content for " + l)
-                continue
+        # Catch exceptions
+        except Exception as e:
+            self.day_failed(day, link, e)
+            return
+        self.day_scraped(day, s)
 
-            s.save_file()
+    def day_started(self, day):
+        """Records that day is being scraped, so it is retried if the run stops before it is done"""
+        if self.manifest:
+            self.manifest.record_started(self.house, day)
 
+    def day_failed(self, day, link, error):
+        """Records a day that raised error while it was scraped
 
-def main(args):
-    CRWriter(args[0], args[1], args[2], args[3]).run()
+        Without a manifest a day that failed for any reason but having no content stops the run,
+        so error is raised again.
+        """
+        if isinstance(error, NoCRContentException):
+            log.info("No content for " + link)
+            self.metrics.count("days_empty")
+            if self.manifest:
+                self.manifest.record_empty(self.house, day)
+        else:
+            self.metrics.count("days_failed")
+            if not self.manifest:
+                raise error
+            # The manifest keeps the day for the next run to retry
+            log.error(f"Failed to retrieve {link}", exc_info=error)
+            self.manifest.record_failed(self.house, day, error)
+        if self.sink:
+            self.sink(day, None)
+
+    def day_scraped(self, day, s):
+        """Saves the content of CRScraper s for day and hands it on"""
+        self.metrics.count("days_fetched")
+        if self.archive:
+            with self.metrics.time("save"):
+                s.save_file()
+                self.layout.record(s.output_file)
+        if self.sink:
+            self.sink(day, s.content)
+        elif self.manifest:
+            self.manifest.record_fetched(self.house, day, s.content)
+
+    def pending_days(self):
+        """(date, link, filename) for each day of the time period the manifest hasn't settled"""
+        return [
+            (d, l, f)
+            for d, l, f in zip(
+                self.daterange(), self.create_links(), self.create_filenames()
+            )
+            if not (self.manifest and self.manifest.is_done(self.house, d))
+        ]
+
+    def run(self, days=None):
+        """Scrapes and saves Congressional Record for complete time period
+
+        : param days: (date, link, filename) tuples to scrape; defaults to pending_days()
+        """
+        if days is None:
+            days = self.pending_days()
+
+        try:
+            if self.parallel_days <= 1:
+                for d, l, f in days:
+                    self.run_day(d, l, f)
+            else:
+                self.run_parallel(days)
+        finally:
+            # Days recorded so far are kept even if the run stops early
+            if self.manifest:
+                self.manifest.flush()
+        self.finish()
+
+    def finish(self):
+        """Logs the session's request stats and trims its cache at the end of a run"""
+        if self.metrics.enabled:
+            counters = self.metrics.counters
+            log.info(
+                f"Requests: {counters.get('requests', 0)}, "
+                f"retries: {counters.get('retries', 0)}"
+            )
+        log.info(f"Request latency: {self.session.stats.summary()}")
+
+        cache = self.session.cache
+        if cache:
+            log.info(
+                f"HTTP cache: {cache.hits} fresh hits, {cache.revalidated} revalidated"
+            )
+            cache.evict()
+
+    def run_parallel(self, days):
+        """Scrapes (date, link, filename) tuples across a pool of parallel_days workers"""
+        # Each day is saved by its worker as soon as it is scraped
+        with ThreadPoolExecutor(max_workers=self.parallel_days) as executor:
+            futures = [executor.submit(self.run_day, d, l, f) for d, l, f in days]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                # Don't start any more days once one has failed
+                for future in futures:
+                    future.cancel()
+                raise
+
+
+def main(
+    house,
+    directory,
+    startdate,
+    enddate,
+    max_workers=1,
+    parallel_days=1,
+    requests_per_second=None,
+    jitter=0.0,
+    timeout=60,
+    max_retries=4,
+    cache_dir=DEFAULT_CACHE_DIR,
+    cache_fresh_for=0,
+    use_cache=True,
+    compression=None,
+    metrics_json=None,
+    metrics_prometheus=None,
+    layout="flat",
+):
+    cache = ResponseCache(cache_dir, fresh_for=cache_fresh_for) if use_cache else None
+    metrics = Metrics() if metrics_json or metrics_prometheus else None
+    writer = CRWriter(
+        house,
+        directory,
+        startdate,
+        enddate,
+        max_workers=max_workers,
+        parallel_days=parallel_days,
+        requests_per_second=requests_per_second,
+        jitter=jitter,
+        timeout=(10, timeout),
+        max_retries=max_retries,
+        cache=cache,
+        compression=compression,
+        metrics=metrics,
+        layout=layout,
+    )
+    try:
+        writer.run()
+    finally:
+        if metrics:
+            metrics.save(metrics_json, metrics_prometheus)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 5:
-        print(
-            "Incorrect number of arguments. Program requires 4: house of congress (s/h), directory for saving transcripts, startdate (Y-m-d) and enddate (Y-m-d)"
-        )
-        sys.exit()
-    else:
-        main(sys.argv[1:])
+    parser = argparse.ArgumentParser()
+    parser.add_argument("house", type=str, help="house of congress (s/h)")
+    parser.add_argument("directory", type=str, help="directory for saving transcripts")
+    parser.add_argument("startdate", type=str, help="start date (m-d-Y)")
+    parser.add_argument("enddate", type=str, help="end date (m-d-Y)")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        help="maximum number of section pages fetched at once for a day",
+    )
+    parser.add_argument(
+        "--parallel-days", type=int, default=1, help="number of days scraped at once"
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=None,
+        help="global request budget across all days; unlimited if not given",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="maximum random extra pause in seconds after each request",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="read timeout in seconds for each request",
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=4, help="retries for each failed request"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="bypass the HTTP cache and download every page again",
+    )
+    parser.add_argument(
+        "--cache-dir", type=str, default=DEFAULT_CACHE_DIR, help="HTTP cache directory"
+    )
+    parser.add_argument(
+        "--cache-fresh-for",
+        type=float,
+        default=0,
+        help="seconds a cached page is reused without even a conditional request",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=sorted(COMPRESSION_SUFFIXES),
+        default=None,
+        help="save each day compressed; zstd needs the zstandard package",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=sorted(LAYOUTS),
+        default="flat",
+        help="save days in directory itself or in indexed chamber/year/month shards",
+    )
+    parser.add_argument(
+        "--metrics-json", type=str, default=None, help="write a JSON run report here"
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        default=None,
+        help="write run metrics here as a Prometheus textfile",
+    )
+
+    args = parser.parse_args()
+    main(
+        house=args.house,
+        directory=args.directory,
+        startdate=args.startdate,
+        enddate=args.enddate,
+        max_workers=args.max_workers,
+        parallel_days=args.parallel_days,
+        requests_per_second=args.requests_per_second,
+        jitter=args.jitter,
+        timeout=args.timeout,
+        max_retries=args.max_retries,
+        cache_dir=args.cache_dir,
+        cache_fresh_for=args.cache_fresh_for,
+        use_cache=not args.no_cache,
+        compression=args.compress,
+        metrics_json=args.metrics_json,
+        metrics_prometheus=args.metrics_prom,
+        layout=args.layout,
+    )
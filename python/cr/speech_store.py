@@ -0,0 +1,166 @@
+"""SQLite store of parsed speeches with a full-text index on the speech text
+
+Load it with batch_parse --format sqlite, then query it:
+
+    python -m cr.speech_store speeches.sqlite '"health care" reform' --speaker "Mr. McCONNELL" \
+        --start 2010-03-01 --end 2010-03-31
+"""
+
+import argparse
+import sqlite3
+from itertools import groupby
+
+from cr.writers import RECORD_COLUMNS, tsv_field
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS speeches (
+    id INTEGER PRIMARY KEY,
+    date TEXT, chamber TEXT, title TEXT, speaker TEXT, pages TEXT, text TEXT);
+CREATE INDEX IF NOT EXISTS speeches_date ON speeches (date, chamber);
+CREATE INDEX IF NOT EXISTS speeches_chamber ON speeches (chamber);
+CREATE INDEX IF NOT EXISTS speeches_title ON speeches (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS speeches_speaker ON speeches (speaker COLLATE NOCASE);
+CREATE VIRTUAL TABLE IF NOT EXISTS speeches_fts USING fts5 (
+    text, content='speeches', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS speeches_insert AFTER INSERT ON speeches BEGIN
+    INSERT INTO speeches_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS speeches_delete AFTER DELETE ON speeches BEGIN
+    INSERT INTO speeches_fts (speeches_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+class SpeechStore:
+    """Speeches in an SQLite database, with indexes on date, chamber, title and speaker
+
+    Used as a writer, rows are inserted batch_size at a time, one transaction per batch. Writing
+    a (date, chamber) that is already in the store replaces its rows.
+    """
+
+    extension = "sqlite"
+
+    def __init__(self, path, columns=RECORD_COLUMNS, batch_size=10000):
+        if tuple(columns) != RECORD_COLUMNS:
+            raise ValueError(f"SpeechStore stores {RECORD_COLUMNS} columns only")
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.buffer = []
+        # Days written through this store, whose older rows are already gone
+        self.days_written = set()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.buffer.append(tuple(row))
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Inserts the buffered rows in one transaction"""
+        if not self.buffer:
+            return
+        with self.connection:
+            for key, _ in groupby(self.buffer, lambda row: (row[0], row[1])):
+                if key not in self.days_written:
+                    self.connection.execute(
+                        "DELETE FROM speeches WHERE date = ? AND chamber = ?", key
+                    )
+                    self.days_written.add(key)
+            self.connection.executemany(
+                "INSERT INTO speeches (date, chamber, title, speaker, pages, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self.buffer,
+            )
+        self.buffer = []
+
+    def search(
+        self,
+        query=None,
+        speaker=None,
+        title=None,
+        chamber=None,
+        start=None,
+        end=None,
+        limit=20,
+    ):
+        """Returns (date, chamber, title, speaker, pages, text) rows matching every given filter
+
+        Full-text matches are best first, with text cut to a snippet around the match; other
+        results are in date order.
+
+        : param query: FTS5 query on the speech text, e.g. '"health care" AND reform'
+        : param speaker: speaker, ignoring case
+        : param title: title, ignoring case
+        : param chamber: H or S
+        : param start: first ISO date
+        : param end: last ISO date
+        """
+        self.flush()
+        conditions = []
+        params = []
+        for sql, value in [
+            ("speeches_fts MATCH ?", query),
+            ("s.speaker = ? COLLATE NOCASE", speaker),
+            ("s.title = ? COLLATE NOCASE", title),
+            ("s.chamber = ?", chamber and chamber.upper()),
+            ("s.date >= ?", start),
+            ("s.date <= ?", end),
+        ]:
+            if value is not None:
+                conditions.append(sql)
+                params.append(value)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if query is not None:
+            sql = (
+                "SELECT s.date, s.chamber, s.title, s.speaker, s.pages, "
+                "snippet(speeches_fts, 0, '[', ']', '...', 16) "
+                "FROM speeches_fts JOIN speeches s ON s.id = speeches_fts.rowid"
+                f"{where} ORDER BY rank LIMIT ?"
+            )
+        else:
+            sql = (
+                "SELECT s.date, s.chamber, s.title, s.speaker, s.pages, s.text "
+                f"FROM speeches s{where} ORDER BY s.date, s.chamber, s.id LIMIT ?"
+            )
+        return self.connection.execute(sql, params + [limit]).fetchall()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database", type=str, help="database written by batch_parse")
+    parser.add_argument(
+        "query", type=str, nargs="?", default=None, help="FTS5 query on speech text"
+    )
+    parser.add_argument("--speaker", type=str, default=None)
+    parser.add_argument("--title", type=str, default=None)
+    parser.add_argument("--chamber", choices=["H", "S", "h", "s"], default=None)
+    parser.add_argument("--start", type=str, default=None, help="first date, Y-m-d")
+    parser.add_argument("--end", type=str, default=None, help="last date, Y-m-d")
+    parser.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    with SpeechStore(args.database) as store:
+        for row in store.search(
+            args.query,
+            speaker=args.speaker,
+            title=args.title,
+            chamber=args.chamber,
+            start=args.start,
+            end=args.end,
+            limit=args.limit,
+        ):
+            print("\t".join(tsv_field(v) for v in row))
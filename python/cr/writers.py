@@ -0,0 +1,377 @@
+"""Output backends for parsed speech records"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from itertools import groupby
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Fields of one parsed speech, in output column order
+RECORD_COLUMNS = ("date", "chamber", "title", "speaker", "pages", "text")
+# Columns with few distinct values, stored as dictionary indices in columnar output
+DICTIONARY_COLUMNS = ("chamber", "title", "speaker")
+
+
+def tsv_field(value):
+    """Drops newlines and tabs so a value fits in one TSV cell"""
+    return str(value).replace("\n", "").replace("\t", "")
+
+
+class TSVWriter:
+    """Writes records as tab separated lines with a header row"""
+
+    extension = "tsv"
+
+    def __init__(self, path, columns=RECORD_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.file = open(path, "w")
+        self.file.write("\t".join(columns) + "\n")
+
+    def write_rows(self, rows):
+        self.file.writelines(
+            "\t".join(tsv_field(v) for v in row) + "\n" for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetWriter:
+    """Writes records to a Parquet file, one row group per row_group_size rows
+
+    Only one row group is held in memory. date is stored as a date, null for the records of a
+    file whose date wasn't known, and the DICTIONARY_COLUMNS are dictionary encoded, so readers
+    can load just the columns they need cheaply.
+    """
+
+    extension = "parquet"
+
+    def __init__(self, path, columns=RECORD_COLUMNS, row_group_size=50000):
+        if pa is None:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([(c, self.column_type(c)) for c in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.buffer = [[] for _ in columns]
+
+    @staticmethod
+    def column_type(column):
+        if column == "date":
+            return pa.date32()
+        if column in DICTIONARY_COLUMNS:
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.string()
+
+    def write_rows(self, rows):
+        for row in rows:
+            for values, value in zip(self.buffer, row):
+                values.append(value)
+            if len(self.buffer[0]) >= self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as one row group"""
+        if not self.buffer[0]:
+            return
+        arrays = []
+        for column, values in zip(self.columns, self.buffer):
+            if column == "date":
+                values = [
+                    datetime.strptime(v, "%Y-%m-%d").date() if v else None
+                    for v in values
+                ]
+                arrays.append(pa.array(values, pa.date32()))
+            elif column in DICTIONARY_COLUMNS:
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, pa.string()))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self.writer.write_table(table, row_group_size=len(self.buffer[0]))
+        self.buffer = [[] for _ in self.columns]
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AppendingTSVWriter:
+    """Adds days of records to a TSV corpus in place, replacing days that are written again
+
+    An SQLite index next to the corpus (path + ".index") holds the byte range of each
+    (date, chamber) in the corpus and the (title, speech hash) of each of its rows. Writing a day
+    whose rows are unchanged is a no-op. Otherwise its old rows are cut off the end of the file
+    or, further back, overwritten with newlines, and the new rows are appended. A nightly update
+    costs O(new day) whatever the size of the corpus.
+
+    Overwritten rows leave blank lines, which readers of the corpus must skip, and the space
+    isn't reused: once they are more than compact_fraction of the file, or when compact is
+    called, the corpus is rewritten without them.
+    """
+
+    extension = "tsv"
+    index_suffix = ".index"
+
+    def __init__(self, path, columns=RECORD_COLUMNS, compact_fraction=0.25):
+        """
+        : param compact_fraction: compact the corpus once overwritten rows are more than this
+            fraction of its bytes; None to only compact when compact is called
+        """
+        self.path = path
+        self.columns = columns
+        self.compact_fraction = compact_fraction
+        new_corpus = not os.path.exists(path)
+        if new_corpus:
+            with open(path, "w") as f:
+                f.write("\t".join(columns) + "\n")
+        index_path = path + self.index_suffix
+        # An index left behind by a deleted corpus describes rows that are gone
+        new_index = new_corpus or not os.path.exists(index_path)
+        self.index = sqlite3.connect(index_path)
+        self.index.executescript("""
+            CREATE TABLE IF NOT EXISTS days (
+                date TEXT, chamber TEXT, offset INTEGER, length INTEGER,
+                PRIMARY KEY (date, chamber));
+            CREATE TABLE IF NOT EXISTS speeches (
+                date TEXT, chamber TEXT, position INTEGER, title TEXT, hash TEXT,
+                PRIMARY KEY (date, chamber, position));
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER);
+            """)
+        self.file = open(path, "r+b")
+        # dirty is set while the corpus is being changed, so an interrupted write is detected
+        if new_index or self.get_state("dirty"):
+            self.rebuild_index()
+        self.end = self.file.seek(0, os.SEEK_END)
+        # Bytes of overwritten rows
+        self.dead = self.get_state("dead") or 0
+
+    @staticmethod
+    def format_row(row):
+        return ("\t".join(tsv_field(v) for v in row) + "\n").encode("utf-8")
+
+    @staticmethod
+    def row_hash(line):
+        return hashlib.sha1(line).hexdigest()
+
+    def get_state(self, key):
+        row = self.index.execute("SELECT value FROM state WHERE key = ?", (key,))
+        row = row.fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        self.index.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def rebuild_index(self):
+        """Indexes the whole corpus; only needed for a new index or after an interrupted write"""
+        with self.index:
+            self.set_state("dirty", 1)
+        self.file.seek(0)
+        offset = len(self.file.readline())
+        days = {}
+        dead = 0
+        for line in iter(self.file.readline, b""):
+            if not line.endswith(b"\n"):
+                # Partial row from an interrupted write
+                self.file.truncate(offset)
+                break
+            fields = line.split(b"\t")
+            if len(fields) > 2:
+                key = (fields[0].decode("utf-8"), fields[1].decode("utf-8"))
+                day = days.setdefault(key, [offset, offset, []])
+                day[1] = offset + len(line)
+                day[2].append((fields[2].decode("utf-8"), self.row_hash(line)))
+            else:
+                dead += len(line)
+            offset += len(line)
+        with self.index:
+            self.index.execute("DELETE FROM days")
+            self.index.execute("DELETE FROM speeches")
+            for key, (start, end, entries) in days.items():
+                self.insert_day(key, start, end - start, entries)
+            self.set_state("dead", dead)
+            self.set_state("dirty", 0)
+
+    def insert_day(self, key, offset, length, entries):
+        """Indexes the rows of key = (date, chamber), given as (title, hash) entries"""
+        self.index.execute(
+            "INSERT OR REPLACE INTO days (date, chamber, offset, length) VALUES (?, ?, ?, ?)",
+            key + (offset, length),
+        )
+        self.index.execute("DELETE FROM speeches WHERE date = ? AND chamber = ?", key)
+        self.index.executemany(
+            "INSERT INTO speeches (date, chamber, position, title, hash) VALUES (?, ?, ?, ?, ?)",
+            [key + (i, title, h) for i, (title, h) in enumerate(entries)],
+        )
+
+    def write_day(self, day, chamber, rows):
+        """Writes one day's rows unless they are already in the corpus; returns True if written"""
+        key = (day, chamber)
+        lines = [self.format_row(row) for row in rows]
+        entries = [
+            (tsv_field(row[2]), self.row_hash(line)) for row, line in zip(rows, lines)
+        ]
+        old = self.index.execute(
+            "SELECT offset, length FROM days WHERE date = ? AND chamber = ?", key
+        ).fetchone()
+        if old is not None:
+            hashes = self.index.execute(
+                "SELECT hash FROM speeches WHERE date = ? AND chamber = ? ORDER BY position",
+                key,
+            ).fetchall()
+            if [h for (h,) in hashes] == [h for _, h in entries]:
+                return False
+        with self.index:
+            self.set_state("dirty", 1)
+        if old is not None:
+            self.remove(*old)
+        data = b"".join(lines)
+        offset = self.end
+        self.file.seek(offset)
+        self.file.write(data)
+        self.file.flush()
+        self.end = offset + len(data)
+        with self.index:
+            self.insert_day(key, offset, len(data), entries)
+            self.set_state("dead", self.dead)
+            self.set_state("dirty", 0)
+        if (
+            self.compact_fraction is not None
+            and self.dead > self.compact_fraction * self.end
+        ):
+            self.compact()
+        return True
+
+    def remove(self, offset, length):
+        """Drops the rows in a byte range of the corpus"""
+        if offset + length == self.end:
+            self.file.truncate(offset)
+            self.end = offset
+        else:
+            self.file.seek(offset)
+            self.file.write(b"\n" * length)
+            self.dead += length
+
+    def compact(self):
+        """Rewrites the corpus without the overwritten rows; returns the number of bytes freed"""
+        days = self.index.execute(
+            "SELECT date, chamber, offset, length FROM days ORDER BY offset"
+        ).fetchall()
+        with self.index:
+            self.set_state("dirty", 1)
+        tmp_path = self.path + ".compact"
+        moved = []
+        self.file.seek(0)
+        with open(tmp_path, "wb") as f:
+            offset = f.write(self.file.readline())
+            for day, chamber, old_offset, length in days:
+                self.file.seek(old_offset)
+                f.write(self.file.read(length))
+                moved.append((offset, day, chamber))
+                offset += length
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "r+b")
+        freed, self.end, self.dead = self.end - offset, offset, 0
+        with self.index:
+            self.index.executemany(
+                "UPDATE days SET offset = ? WHERE date = ? AND chamber = ?", moved
+            )
+            self.set_state("dead", 0)
+            self.set_state("dirty", 0)
+        return freed
+
+    def write_rows(self, rows):
+        """Writes rows grouped by (date, chamber), each group replacing that day's rows"""
+        for (day, chamber), day_rows in groupby(rows, lambda row: (row[0], row[1])):
+            self.write_day(day, chamber, list(day_rows))
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Writers by output format name
+WRITER_FORMATS = {"tsv": TSVWriter, "parquet": ParquetWriter}
+
+
+class ShardedWriter:
+    """Sends each row to a per-shard writer in directory, named after the row's shard key
+
+    Rows are expected grouped by shard (e.g. sorted by date), so only one shard is open at a time.
+    """
+
+    def __init__(self, directory, shard_key, writer_class=TSVWriter):
+        """
+        : param directory: directory for the shard files
+        : param shard_key: function from a row to its shard name
+        : param writer_class: writer used for each shard
+        """
+        self.directory = directory
+        self.shard_key = shard_key
+        self.writer_class = writer_class
+        self.shard = None
+        self.writer = None
+        self.finished_shards = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def write_rows(self, rows):
+        for shard, shard_rows in groupby(rows, self.shard_key):
+            if shard != self.shard:
+                self.close()
+                if shard in self.finished_shards:
+                    raise ValueError(f"Rows for shard {shard} are not contiguous")
+                self.shard = shard
+                self.writer = self.writer_class(
+                    os.path.join(
+                        self.directory, f"{shard}.{self.writer_class.extension}"
+                    )
+                )
+            self.writer.write_rows(shard_rows)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+            self.finished_shards.add(self.shard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Shard keys by name, from a row whose first field is the ISO date
+SHARD_KEYS = {
+    "year": lambda row: row[0][:4],
+    "month": lambda row: row[0][:7],
+    "day": lambda row: row[0],
+}
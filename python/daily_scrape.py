@@ -1,44 +1,120 @@
 import argparse
-from datetime import date, datetime, timedelta
-import os
-import sys
+from datetime import date, datetime
 
-from cr.scrape_congressional_record import CRWriter
+from cr.archive import COMPRESSION_SUFFIXES
+from cr.async_scrape import scrape_chambers
+from cr.batch_parse import open_writer
+from cr.http_cache import DEFAULT_CACHE_DIR, ResponseCache
+from cr.layout import LAYOUTS
+from cr.manifest import ScrapeManifest
+from cr.metrics import Metrics
+from cr.pipeline import run_pipeline
 
 # Script for running Congressional Record Scraper Daily to update files
 
+# Requests per second to congress.gov shared by both chambers, so the nightly job stays polite
+DEFAULT_REQUESTS_PER_SECOND = 2.0
 
-def get_start_date(directory):
-    all_files = os.listdir(directory)
 
-    # Get max date from file names
-    file_dates = [x[1:] for x in all_files]
-    file_dates.sort(reverse=True)
-    latest_file = file_dates[0][:10]
-    max_date = datetime(
-        year=int(latest_file[:4]),
-        month=int(latest_file[5:7]),
-        day=int(latest_file[8:10])
-    )
+def get_start_date(manifest, house, default_start=None, layout=None):
+    """Reads the next day to scrape for house from the manifest
 
-    start_date = max_date + timedelta(days=1)
+    An archive scraped before the manifest existed is recorded from its file names once, or
+    from its shard indexes if layout is given.
+    With nothing recorded at all, scraping starts at default_start (today if not given).
+    """
+    start_date = manifest.next_start_date(house)
+    if start_date is None:
+        manifest.bootstrap(house, [d for d, _ in layout.days(house)] if layout else None)
+        start_date = manifest.next_start_date(house)
+    if start_date is None:
+        start_date = default_start or date.today()
     return start_date.strftime('%m-%d-%Y')
 
 
-def main(directory):
-    start_date = get_start_date(directory)
+def main(directory, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, default_start=None,
+         parse_output=None, output_format='tsv', archive=True, compression=None,
+         metrics_json=None, metrics_prometheus=None, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+         layout='flat'):
+    """Scrapes new days into directory
+
+    Both chambers are scraped at once, sharing one connection pool and request budget; with
+    parse_output they are scraped one after the other into the shared output.
+
+    : param parse_output: if given, new days are also parsed as they are scraped and added to
+        this tsv or sqlite output, replacing days already in it
+    : param archive: save the raw text of each day; only turned off with parse_output
+    : param compression: None to save plain .txt files, else "gzip" or "zstd"
+    : param metrics_json: write a JSON report of the run's counters and stage timings here
+    : param metrics_prometheus: write the same as a Prometheus textfile here
+    : param requests_per_second: request budget shared by both chambers; None or 0 for no limit
+    : param layout: "flat" to save days in directory itself, "sharded" to save them in indexed
+        chamber/year/month shards of it
+    """
+    manifest = ScrapeManifest(directory)
     today = date.today()
     todays_date = today.strftime('%m-%d-%Y')
-    # Run House
-    print(f'Running House for {start_date} to {todays_date}')
-    CRWriter('h', directory, start_date, todays_date).run()
-    # Run Senate
-    print(f'Running Senate for {start_date} to {todays_date}')
-    CRWriter('s', directory, start_date, todays_date).run()
+    cache = ResponseCache(cache_dir) if use_cache else None
+    metrics = Metrics() if metrics_json or metrics_prometheus else None
+    writer = open_writer(parse_output, output_format, append=output_format == 'tsv') if parse_output else None
+    periods = []
+    for house, name in [('h', 'House'), ('s', 'Senate')]:
+        # Days already fetched or known to be empty are skipped without a request
+        start_date = get_start_date(manifest, house, default_start, LAYOUTS[layout](directory))
+        print(f'Running {name} for {start_date} to {todays_date}')
+        periods.append((house, start_date, todays_date))
+    try:
+        if writer:
+            for house, start_date, end_date in periods:
+                run_pipeline(writer, house, directory, start_date, end_date, archive=archive,
+                             cache=cache, manifest=manifest, compression=compression, metrics=metrics,
+                             requests_per_second=requests_per_second, layout=layout)
+        else:
+            scrape_chambers(periods, directory, requests_per_second=requests_per_second,
+                            cache=cache, metrics=metrics, manifest=manifest, compression=compression,
+                            layout=layout)
+    finally:
+        if writer:
+            writer.close()
+        if metrics:
+            metrics.save(metrics_json, metrics_prometheus)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('directory', type=str)
+    parser.add_argument('--no-cache', action='store_true',
+                        help='bypass the HTTP cache and download every page again')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--start-date', type=str, default=None,
+                        help='first day (m-d-Y) for a chamber with nothing scraped yet')
+    parser.add_argument('--parse-output', type=str, default=None,
+                        help='also parse new days straight into this file as they are scraped')
+    parser.add_argument('--format', choices=['tsv', 'sqlite'], default='tsv',
+                        help='format of --parse-output')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='with --parse-output, do not save the raw text of each day')
+    parser.add_argument('--compress', choices=sorted(COMPRESSION_SUFFIXES), default=None,
+                        help='save each day compressed; zstd needs the zstandard package')
+    parser.add_argument('--requests-per-second', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help='request budget shared by both chambers; 0 for no limit')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default='flat',
+                        help='save days in the directory itself or in indexed chamber/year/month shards')
+    parser.add_argument('--metrics-json', type=str, default=None, help='write a JSON run report here')
+    parser.add_argument('--metrics-prom', type=str, default=None,
+                        help='write run metrics here as a Prometheus textfile')
     args = parser.parse_args()
-    main(args.directory)
+    main(
+        args.directory,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        default_start=datetime.strptime(args.start_date, '%m-%d-%Y').date() if args.start_date else None,
+        parse_output=args.parse_output,
+        output_format=args.format,
+        archive=not args.no_archive,
+        compression=args.compress,
+        metrics_json=args.metrics_json,
+        metrics_prometheus=args.metrics_prom,
+        requests_per_second=args.requests_per_second,
+        layout=args.layout
+    )
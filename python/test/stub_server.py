@@ -0,0 +1,85 @@
+"""Local HTTP server for tests that need real sockets instead of requests_mock"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class StubResponse:
+    def __init__(self, status=200, body=b"", headers=None, delay=0):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.delay = delay
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive so connection reuse can be observed
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(
+                {
+                    "path": self.path,
+                    "headers": dict(self.headers),
+                    "client_port": self.client_address[1],
+                }
+            )
+            queue = server.responses.get(self.path)
+            if queue is None:
+                response = StubResponse(404)
+            elif len(queue) > 1:
+                response = queue.pop(0)
+            else:
+                response = queue[0]
+
+        if response.delay:
+            threading.Event().wait(response.delay)
+        try:
+            self.send_response(response.status)
+            for name, value in response.headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(response.body)))
+            self.end_headers()
+            self.wfile.write(response.body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up first, e.g. on a timeout
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingStubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubServer:
+    """Serves scripted responses by path; the last response for a path repeats"""
+
+    def __init__(self):
+        self.server = ThreadingStubServer(("127.0.0.1", 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.responses = {}
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def add(self, path, *responses):
+        self.server.responses[path] = list(responses)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,102 @@
+"""Tests compressed daily files"""
+
+import gzip
+import os
+import shutil
+import unittest
+
+import requests_mock
+
+from cr.archive import compressed_name, mapped_bytes, open_text, zstandard
+from cr.batch_parse import find_input_files
+from cr.manifest import day_of_file
+from cr.parse_congressional_record import CRParser
+from cr.scrape_congressional_record import CRWriter
+from test.test_scrape_congressional_record import (
+    day_level_files,
+    day_level_urls,
+    enddate,
+    expected_urls,
+    mock_text_helper,
+    record_level_files,
+    resources_dir,
+    startdate,
+)
+
+tmp_directory = "temp_archive"
+test_file = os.path.join(resources_dir, "parsing_test_input.txt")
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+        with open(test_file) as f:
+            self.text = f.read()
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def check_round_trip(self, compression):
+        path = compressed_name(
+            os.path.join(tmp_directory, "S2010-01-02.txt"), compression
+        )
+        with open_text(path, "w") as f:
+            f.write(self.text)
+        self.assertLess(os.path.getsize(path), len(self.text))
+        with open_text(path) as f:
+            self.assertEqual(f.read(), self.text)
+        # Streaming and whole-file parsing read compressed files the same way
+        expected = list(CRParser(test_file).iter_records(with_pages=True))
+        self.assertEqual(list(CRParser(path).iter_records(with_pages=True)), expected)
+        self.assertEqual(
+            list(CRParser(path, stream=True).iter_records(with_pages=True)), expected
+        )
+        self.assertEqual(
+            list(CRParser(path, memory_map=True).iter_records(with_pages=True)),
+            expected,
+        )
+
+    def test_gzip(self):
+        self.check_round_trip("gzip")
+
+    @unittest.skipUnless(zstandard, "zstandard is not installed")
+    def test_zstd(self):
+        self.check_round_trip("zstd")
+
+    def test_mapped_bytes(self):
+        with mapped_bytes(test_file) as buffer:
+            self.assertEqual(bytes(buffer), self.text.encode("utf-8"))
+        empty = os.path.join(tmp_directory, "S2010-01-02.txt")
+        open(empty, "w").close()
+        with mapped_bytes(empty) as buffer:
+            self.assertEqual(buffer, b"")
+        self.assertEqual(list(CRParser(empty, memory_map=True).iter_records()), [])
+
+    def test_file_names(self):
+        self.assertEqual(day_of_file("H2010-01-02.txt.gz"), ("H", "2010-01-02"))
+        self.assertEqual(day_of_file("S2010-01-02.txt.zst"), ("S", "2010-01-02"))
+        with self.assertRaises(ValueError):
+            day_of_file("S2010-01-02.txt.bz2")
+        for name in ["S2010-01-02.txt.gz", "H2010-01-02.txt", "S2010-01-02.txt.tmp"]:
+            open(os.path.join(tmp_directory, name), "w").close()
+        files = [os.path.basename(f) for f in find_input_files([tmp_directory])]
+        self.assertEqual(files, ["H2010-01-02.txt", "S2010-01-02.txt.gz"])
+
+    @requests_mock.Mocker()
+    def test_compressed_scrape(self, mocker):
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        CRWriter("s", tmp_directory, startdate, enddate, compression="gzip").run()
+
+        self.assertEqual(os.listdir(tmp_directory), ["S2010-01-02.txt.gz"])
+        with gzip.open(os.path.join(tmp_directory, "S2010-01-02.txt.gz"), "rt") as f:
+            self.assertIn("Congressional Record", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
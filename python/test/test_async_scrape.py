@@ -0,0 +1,156 @@
+"""Tests the asyncio engine scraping both chambers at once"""
+
+import os
+import shutil
+import unittest
+from time import monotonic
+
+import requests
+import requests_mock
+
+from benchmarks.corpus import day_page_html, generate_sections
+from cr.async_scrape import AsyncCRScraper, scrape_chambers
+from cr.http_session import CRSession
+from cr.manifest import ScrapeManifest
+from cr.scrape_congressional_record import CRWriter
+from test.stub_server import StubResponse, StubServer
+from test.test_scrape_congressional_record import (
+    day_level_files,
+    day_level_urls,
+    enddate,
+    expected_urls,
+    mock_text_helper,
+    record_level_files,
+    resources_dir,
+    startdate,
+)
+
+tmp_directory = "temp_async"
+house_day_urls = [u.replace("senate-section", "house-section") for u in day_level_urls]
+
+
+class AsyncScrapeTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def mock_pages(self, mocker):
+        # The House days link to the same sections as the Senate days
+        for urls in [day_level_urls, house_day_urls]:
+            for u, f in zip(urls, day_level_files):
+                mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+
+    def read_directory(self, directory):
+        contents = {}
+        for name in os.listdir(directory):
+            if name.endswith(".txt"):
+                with open(os.path.join(directory, name)) as f:
+                    contents[name] = f.read()
+        return contents
+
+    @requests_mock.Mocker()
+    def test_matches_crwriter(self, mocker):
+        self.mock_pages(mocker)
+        sync_directory = os.path.join(tmp_directory, "sync")
+        async_directory = os.path.join(tmp_directory, "async")
+        os.makedirs(sync_directory)
+        os.makedirs(async_directory)
+        for house in "hs":
+            CRWriter(house, sync_directory, startdate, enddate).run()
+        manifest = ScrapeManifest(async_directory)
+        scrape_chambers(
+            [("h", startdate, enddate), ("s", startdate, enddate)],
+            async_directory,
+            manifest=manifest,
+        )
+
+        contents = self.read_directory(async_directory)
+        self.assertEqual(sorted(contents), ["H2010-01-02.txt", "S2010-01-02.txt"])
+        self.assertEqual(contents, self.read_directory(sync_directory))
+        for house in "HS":
+            self.assertIn("2010-01-02", manifest.chamber(house)["fetched"])
+            self.assertIn("2010-01-01", manifest.chamber(house)["empty"])
+
+    @requests_mock.Mocker()
+    def test_failures_are_recorded(self, mocker):
+        self.mock_pages(mocker)
+        mocker.get(day_level_urls[1], status_code=503)
+        manifest = ScrapeManifest(tmp_directory)
+        session = CRSession(max_retries=0)
+        writers = [
+            CRWriter(
+                house,
+                tmp_directory,
+                startdate,
+                enddate,
+                manifest=manifest,
+                session=session,
+            )
+            for house in "hs"
+        ]
+        AsyncCRScraper(writers).run()
+
+        self.assertIn("2010-01-02", manifest.chamber("S")["failed"])
+        self.assertIn("2010-01-02", manifest.chamber("H")["fetched"])
+        # Without a manifest a failed day stops the run
+        with self.assertRaises(requests.HTTPError):
+            AsyncCRScraper(
+                [CRWriter("s", tmp_directory, startdate, enddate, session=session)]
+            ).run()
+
+    def scrape_stub_chambers(self, delay, connections_per_host):
+        """Seconds to scrape a day of two sections for each chamber, each response taking delay"""
+        server = StubServer().start()
+        try:
+            for chamber in "HS":
+                links = []
+                for n, page in enumerate(generate_sections(2, chamber=chamber)):
+                    links.append(server.url(f"/{chamber}/section/{n}"))
+                    response = StubResponse(body=page.encode("utf-8"), delay=delay)
+                    server.add(f"/{chamber}/section/{n}", response)
+                day_page = day_page_html(links, chamber).encode("utf-8")
+                section = "senate" if chamber == "S" else "house"
+                server.add(
+                    f"/congressional-record/2010/01/04/{section}-section",
+                    StubResponse(body=day_page, delay=delay),
+                )
+            session = CRSession(max_retries=0)
+            writers = []
+            for house in "hs":
+                writer = CRWriter(
+                    house, tmp_directory, "01-04-2010", "01-04-2010", session=session
+                )
+                writer.url_prefix = server.url("/congressional-record/")
+                writers.append(writer)
+            start = monotonic()
+            AsyncCRScraper(writers, connections_per_host=connections_per_host).run()
+            elapsed = monotonic() - start
+            session.close()
+        finally:
+            server.stop()
+        self.assertEqual(
+            sorted(self.read_directory(tmp_directory)),
+            ["H2010-01-04.txt", "S2010-01-04.txt"],
+        )
+        return elapsed
+
+    def test_chambers_overlap(self):
+        # One after the other, each chamber takes a day page then its sections: 4 delays in all
+        self.assertLess(self.scrape_stub_chambers(0.3, connections_per_host=8), 1.0)
+
+    def test_connections_per_host(self):
+        # One connection at a time to the one host serializes all 6 requests
+        self.assertGreaterEqual(
+            self.scrape_stub_chambers(0.2, connections_per_host=1), 1.2
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+"""Tests the multi-process batch parser"""
+
+import gzip
+import json
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from cr.batch_parse import day_of_file, find_input_files, parse_files, run_batch
+from cr.archive import file_hash
+from cr.fingerprints import ParseFingerprints
+from cr.metrics import Metrics
+from cr.writers import RECORD_COLUMNS, pa
+
+tmp_directory = "temp_batch"
+resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+test_file = "parsing_test_input.txt"
+
+daily_files = [
+    "S2010-01-02.txt",
+    "H2010-01-02.txt",
+    "S2010-01-01.txt",
+    "H2010-02-03.txt",
+]
+
+
+class BatchParseTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        self.input_directory = os.path.join(tmp_directory, "raw")
+        os.makedirs(self.input_directory)
+        for name in daily_files:
+            shutil.copy(
+                os.path.join(resources_dir, test_file),
+                os.path.join(self.input_directory, name),
+            )
+        # Files that aren't daily files are ignored
+        open(os.path.join(self.input_directory, "manifest.json"), "w").close()
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def read_rows(self, path):
+        with open(path) as f:
+            return [line.rstrip("\n").split("\t") for line in f]
+
+    def test_day_of_file(self):
+        self.assertEqual(day_of_file("some/dir/H2010-01-02.txt"), ("H", "2010-01-02"))
+        with self.assertRaises(ValueError):
+            day_of_file("manifest.json")
+
+    def test_find_input_files(self):
+        files = [os.path.basename(f) for f in find_input_files([self.input_directory])]
+        self.assertEqual(
+            files,
+            [
+                "S2010-01-01.txt",
+                "H2010-01-02.txt",
+                "S2010-01-02.txt",
+                "H2010-02-03.txt",
+            ],
+        )
+        pattern = os.path.join(self.input_directory, "S*.txt")
+        self.assertEqual(len(find_input_files([pattern])), 2)
+
+    def test_find_input_files_one_per_day(self):
+        plain = os.path.join(self.input_directory, "S2010-01-02.txt")
+        with open(plain, "rb") as f, gzip.open(plain + ".gz", "wb") as g:
+            g.write(f.read())
+        other_directory = os.path.join(tmp_directory, "other")
+        os.makedirs(other_directory)
+        shutil.copy(plain, other_directory)
+        os.rename(plain, plain + ".bak")
+
+        # The compressed file is the only one of the first input, but plain files come first
+        with self.assertLogs("cr.batch_parse", "WARNING"):
+            files = find_input_files([self.input_directory, other_directory])
+        self.assertEqual(len(files), 4)
+        self.assertIn(os.path.join(other_directory, "S2010-01-02.txt"), files)
+
+        os.rename(plain + ".bak", plain)
+        with self.assertLogs("cr.batch_parse", "WARNING"):
+            files = find_input_files([other_directory, self.input_directory])
+        self.assertEqual(files[2], os.path.join(other_directory, "S2010-01-02.txt"))
+        with self.assertLogs("cr.batch_parse", "WARNING"):
+            files = find_input_files([self.input_directory])
+        self.assertEqual(files[2], plain)
+
+        # Both forms of a day are parsed once, and appended without duplicate rows
+        output = os.path.join(tmp_directory, "speeches.tsv")
+        full_output = os.path.join(tmp_directory, "full.tsv")
+        self.assertEqual(run_batch([self.input_directory], output, append=True), 4)
+        self.assertEqual(run_batch([self.input_directory], output, append=True), 0)
+        os.remove(plain + ".gz")
+        run_batch([self.input_directory], full_output)
+        self.assertEqual(self.read_rows(output), self.read_rows(full_output))
+
+    def test_parse_files_window(self):
+        files = find_input_files([self.input_directory])
+        expected = list(parse_files(files, workers=1))
+        self.assertEqual(list(parse_files(files, workers=2, window=1)), expected)
+        self.assertEqual(list(parse_files(files, workers=2, window=3)), expected)
+
+    def test_run_batch(self):
+        serial_output = os.path.join(tmp_directory, "serial.tsv")
+        parallel_output = os.path.join(tmp_directory, "parallel.tsv")
+        self.assertEqual(run_batch([self.input_directory], serial_output, workers=1), 4)
+        run_batch([self.input_directory], parallel_output, workers=2)
+
+        rows = self.read_rows(serial_output)
+        self.assertEqual(rows, self.read_rows(parallel_output))
+        self.assertEqual(tuple(rows[0]), RECORD_COLUMNS)
+        self.assertEqual(
+            [r[:2] for r in rows[1:3]], [["2010-01-01", "S"], ["2010-01-01", "S"]]
+        )
+        self.assertIn(
+            [
+                "2010-01-02",
+                "H",
+                "APPOINTMENT OF ACTING PRESIDENT PRO TEMPORE",
+                "Mr. McCONNELL",
+            ],
+            [r[:4] for r in rows],
+        )
+
+    def test_run_batch_memory_map(self):
+        output = os.path.join(tmp_directory, "speeches.tsv")
+        mapped_output = os.path.join(tmp_directory, "mapped.tsv")
+        run_batch([self.input_directory], output, workers=1)
+        run_batch([self.input_directory], mapped_output, workers=2, memory_map=True)
+        self.assertEqual(self.read_rows(mapped_output), self.read_rows(output))
+
+    def test_run_batch_sharded(self):
+        output = os.path.join(tmp_directory, "shards")
+        run_batch([self.input_directory], output, workers=2, shard_by="month")
+        self.assertEqual(sorted(os.listdir(output)), ["2010-01.tsv", "2010-02.tsv"])
+        rows = self.read_rows(os.path.join(output, "2010-02.tsv"))
+        self.assertTrue(all(r[0] == "2010-02-03" for r in rows[1:]))
+
+    def test_run_batch_append(self):
+        output = os.path.join(tmp_directory, "speeches.tsv")
+        full_output = os.path.join(tmp_directory, "full.tsv")
+        first_month = os.path.join(self.input_directory, "*2010-01-*.txt")
+        run_batch([first_month], output, workers=1, append=True)
+        # Days already in the output are not written twice
+        run_batch([self.input_directory], output, workers=1, append=True)
+        run_batch([self.input_directory], full_output, workers=1)
+        self.assertEqual(self.read_rows(output), self.read_rows(full_output))
+
+    def test_run_batch_skips_unchanged(self):
+        output = os.path.join(tmp_directory, "speeches.tsv")
+
+        def parsed(**options):
+            return run_batch([self.input_directory], output, workers=1, **options)
+
+        self.assertEqual(parsed(append=True), 4)
+        metrics = Metrics()
+        self.assertEqual(parsed(append=True, metrics=metrics), 0)
+        self.assertEqual(metrics.counters["days_skipped"], 4)
+        # A touched file is still current, a changed one isn't
+        os.utime(os.path.join(self.input_directory, "H2010-01-02.txt"), ns=(0, 0))
+        with open(os.path.join(self.input_directory, "S2010-01-01.txt"), "a") as f:
+            f.write("\n")
+        self.assertEqual(parsed(append=True), 1)
+        # A new parser configuration, --force or a fresh output parses everything again
+        with mock.patch("cr.parse_congressional_record.PARSER_VERSION", 0):
+            self.assertEqual(parsed(append=True), 4)
+        self.assertEqual(parsed(append=True, force=True), 4)
+        os.remove(output)
+        self.assertEqual(parsed(append=True), 4)
+        self.assertEqual(len(self.read_rows(output)), 17)
+        self.assertEqual(parsed(), 4)
+
+    def test_fingerprints_hashed_by_workers(self):
+        output = os.path.join(tmp_directory, "speeches.tsv")
+        # Files without fingerprints are stale without being hashed up front
+        with mock.patch("cr.fingerprints.file_hash") as hashed:
+            fingerprints = ParseFingerprints(output, reset=True)
+            for file_path in find_input_files([self.input_directory]):
+                self.assertFalse(fingerprints.is_current(file_path))
+        hashed.assert_not_called()
+
+        run_batch([self.input_directory], output, workers=2)
+        with open(output + ParseFingerprints.suffix) as f:
+            days = json.load(f)["days"]
+        self.assertEqual(
+            days["H2010-02-03"]["sha256"],
+            file_hash(os.path.join(resources_dir, test_file)),
+        )
+        # An unchanged archive is checked from sizes and mtimes alone
+        with mock.patch("cr.fingerprints.file_hash") as hashed:
+            self.assertEqual(
+                run_batch([self.input_directory], output, workers=2, append=True), 0
+            )
+        hashed.assert_not_called()
+
+    @unittest.skipUnless(pa, "pyarrow is not installed")
+    def test_run_batch_parquet(self):
+        import pyarrow.parquet as pq
+
+        output = os.path.join(tmp_directory, "speeches.parquet")
+        run_batch([self.input_directory], output, workers=1, output_format="parquet")
+        tsv_output = os.path.join(tmp_directory, "speeches.tsv")
+        run_batch([self.input_directory], tsv_output, workers=1)
+        table = pq.read_table(output, columns=["speaker", "pages"])
+        tsv_rows = self.read_rows(tsv_output)[1:]
+        self.assertEqual(table.column("speaker").to_pylist(), [r[3] for r in tsv_rows])
+        self.assertEqual(table.column("pages").to_pylist(), [r[4] for r in tsv_rows])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Tests that targeted extraction matches parsing whole pages"""
+
+import os
+import unittest
+
+from bs4 import BeautifulSoup
+
+from cr.html_extract import PARSER, extract_links, extract_record
+
+resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+day_files = ["test_page_20100101.txt", "test_page_20100102.txt"]
+record_files = ["test_record1.txt", "test_record2.txt", "test_record3.txt"]
+
+
+def read_bytes(name):
+    with open(os.path.join(resources_dir, name), "rb") as f:
+        return f.read()
+
+
+class HTMLExtractTest(unittest.TestCase):
+    def test_extract_links(self):
+        for name in day_files:
+            html = read_bytes(name)
+            cells = BeautifulSoup(html, PARSER).find_all("td")
+            expected = [cells[i].a.get("href") for i in range(0, len(cells), 2)]
+            self.assertEqual(extract_links(html), expected)
+        self.assertEqual(len(extract_links(read_bytes("test_page_20100102.txt"))), 3)
+
+    def test_extract_record(self):
+        for name in record_files:
+            html = read_bytes(name)
+            pre = BeautifulSoup(html, PARSER).find("pre", class_="styled")
+            self.assertEqual(extract_record(html), str(pre.contents))
+
+    def test_extract_record_latin1(self):
+        html = read_bytes("test_record1.txt").replace(
+            b"Senate", "S\xe9nat".encode("latin-1"), 1
+        )
+        self.assertIn("[", extract_record(html))
+
+    def test_missing_record(self):
+        with self.assertRaises(ValueError):
+            extract_record(read_bytes("test_page_20100102.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
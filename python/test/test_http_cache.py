@@ -0,0 +1,117 @@
+"""Tests ResponseCache and conditional GETs through CRSession"""
+
+import os
+import shutil
+import unittest
+from time import time
+
+from cr.http_cache import ResponseCache
+from cr.http_session import CRSession
+from test.stub_server import StubResponse, StubServer
+
+tmp_directory = "temp_cache"
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        self.server = StubServer().start()
+        self.cache = ResponseCache(tmp_directory)
+        self.session = CRSession(max_retries=0, cache=self.cache)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def test_conditional_get(self):
+        self.server.add(
+            "/page",
+            StubResponse(
+                body=b"content",
+                headers={
+                    "ETag": '"v1"',
+                    "Last-Modified": "Sat, 02 Jan 2010 00:00:00 GMT",
+                },
+            ),
+            StubResponse(304),
+        )
+        url = self.server.url("/page")
+        self.assertEqual(self.session.get(url).content, b"content")
+        self.assertEqual(self.session.get(url).content, b"content")
+
+        second_request = self.server.requests[1]["headers"]
+        self.assertEqual(second_request["If-None-Match"], '"v1"')
+        self.assertEqual(
+            second_request["If-Modified-Since"], "Sat, 02 Jan 2010 00:00:00 GMT"
+        )
+        self.assertEqual(self.cache.revalidated, 1)
+
+    def test_changed_page(self):
+        self.server.add(
+            "/page",
+            StubResponse(body=b"old", headers={"ETag": '"v1"'}),
+            StubResponse(body=b"new", headers={"ETag": '"v2"'}),
+        )
+        url = self.server.url("/page")
+        self.session.get(url)
+        self.assertEqual(self.session.get(url).content, b"new")
+        self.assertEqual(self.cache.get(url).etag, '"v2"')
+
+    def test_fresh_entry_skips_request(self):
+        self.cache.fresh_for = 60
+        self.server.add(
+            "/page", StubResponse(body=b"content", headers={"ETag": '"v1"'})
+        )
+        url = self.server.url("/page")
+        self.session.get(url)
+        self.assertEqual(self.session.get(url).content, b"content")
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_unvalidated_response_not_cached(self):
+        # Without validators an entry could never be revalidated, only served while fresh
+        self.server.add("/page", StubResponse(body=b"content"))
+        url = self.server.url("/page")
+        self.session.get(url)
+        self.assertIsNone(self.cache.get(url))
+        self.cache.fresh_for = 60
+        self.session.get(url)
+        self.assertEqual(self.cache.get(url).body, b"content")
+
+    def test_errors_not_cached(self):
+        self.server.add("/missing", StubResponse(404))
+        url = self.server.url("/missing")
+        self.session.get(url)
+        self.assertIsNone(self.cache.get(url))
+
+    def test_evict_by_age(self):
+        self.server.add(
+            "/page", StubResponse(body=b"content", headers={"ETag": '"v1"'})
+        )
+        url = self.server.url("/page")
+        self.session.get(url)
+        meta_path = self.cache.paths(url)[1]
+        old = time() - 2 * self.cache.max_age
+        os.utime(meta_path, (old, old))
+        self.cache.evict()
+        self.assertIsNone(self.cache.get(url))
+
+    def test_evict_by_size(self):
+        self.server.add("/a", StubResponse(body=b"a" * 10, headers={"ETag": '"a"'}))
+        self.server.add("/b", StubResponse(body=b"b" * 10, headers={"ETag": '"b"'}))
+        self.session.get(self.server.url("/a"))
+        self.session.get(self.server.url("/b"))
+        # /a is least recently used
+        old = time() - 60
+        os.utime(self.cache.paths(self.server.url("/a"))[1], (old, old))
+        self.cache.max_bytes = 15
+        self.cache.evict()
+        self.assertIsNone(self.cache.get(self.server.url("/a")))
+        self.assertIsNotNone(self.cache.get(self.server.url("/b")))
+
+
+if __name__ == "__main__":
+    unittest.main()
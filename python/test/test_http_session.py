@@ -0,0 +1,112 @@
+"""Tests CRSession against a local stub server"""
+
+import gzip
+import unittest
+
+import requests
+
+from cr.http_session import CRSession, LatencyStats, RateLimiter
+from cr.metrics import Metrics
+from test.stub_server import StubResponse, StubServer
+
+
+class CRSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer().start()
+        self.metrics = Metrics()
+        self.session = CRSession(
+            timeout=(1, 1), max_retries=2, backoff_factor=0.01, metrics=self.metrics
+        )
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def test_get(self):
+        self.server.add("/page", StubResponse(body=b"content"))
+        response = self.session.get(self.server.url("/page"))
+        self.assertEqual(response.content, b"content")
+        self.assertEqual(self.metrics.counters["requests"], 1)
+        self.assertEqual(self.metrics.counters["bytes_fetched"], len(b"content"))
+
+    def test_connection_reuse(self):
+        self.server.add("/page", StubResponse(body=b"content"))
+        for _ in range(3):
+            self.session.get(self.server.url("/page"))
+        ports = set(r["client_port"] for r in self.server.requests)
+        self.assertEqual(len(ports), 1)
+
+    def test_gzip(self):
+        self.server.add(
+            "/page",
+            StubResponse(
+                body=gzip.compress(b"compressed content"),
+                headers={"Content-Encoding": "gzip"},
+            ),
+        )
+        response = self.session.get(self.server.url("/page"))
+        self.assertEqual(response.content, b"compressed content")
+        self.assertIn("gzip", self.server.requests[0]["headers"]["Accept-Encoding"])
+
+    def test_retry_after(self):
+        self.server.add(
+            "/page",
+            StubResponse(503, headers={"Retry-After": "0"}),
+            StubResponse(body=b"content"),
+        )
+        response = self.session.get(self.server.url("/page"))
+        self.assertEqual(response.content, b"content")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.metrics.counters["requests"], 2)
+        self.assertEqual(self.metrics.counters["retries"], 1)
+
+    def test_retries_exhausted(self):
+        self.server.add("/page", StubResponse(503))
+        with self.assertRaises(requests.HTTPError):
+            self.session.get(self.server.url("/page"))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_no_retry_for_client_error(self):
+        self.server.add("/page", StubResponse(404))
+        self.assertEqual(self.session.get(self.server.url("/page")).status_code, 404)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_timeout(self):
+        session = CRSession(timeout=(1, 0.1), max_retries=0)
+        self.server.add("/slow", StubResponse(body=b"late", delay=0.5))
+        with self.assertRaises(requests.Timeout):
+            session.get(self.server.url("/slow"))
+        session.close()
+
+
+class LatencyStatsTest(unittest.TestCase):
+    def test_summary(self):
+        stats = LatencyStats()
+        self.assertEqual(stats.summary(), {})
+        for seconds in [0.1, 0.2, 0.3, 0.4]:
+            stats.record(seconds)
+        summary = stats.summary()
+        self.assertAlmostEqual(summary["total"], 1.0)
+        self.assertAlmostEqual(summary["mean"], 0.25)
+        self.assertEqual(summary["min"], 0.1)
+        self.assertEqual(summary["max"], 0.4)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_reserve(self):
+        limiter = RateLimiter(2)
+        self.assertEqual(limiter.reserve(), 0)
+        # Later requests are spaced out by half a second each
+        self.assertAlmostEqual(limiter.reserve(), 0.5, places=2)
+        self.assertAlmostEqual(limiter.reserve(), 1.0, places=2)
+
+    def test_jitter(self):
+        limiter = RateLimiter(10, jitter=1)
+        limiter.reserve()
+        delay = limiter.reserve()
+        self.assertGreaterEqual(delay, 0.09)
+        self.assertLessEqual(delay, 1.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
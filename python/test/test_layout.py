@@ -0,0 +1,162 @@
+"""Tests the flat and sharded archive layouts"""
+
+import json
+import os
+import shutil
+import unittest
+
+import requests_mock
+
+from cr.archive import day_file, file_hash
+from cr.batch_parse import find_input_files, run_batch
+from cr.layout import FlatLayout, ShardedLayout, open_layout
+from cr.manifest import ScrapeManifest
+from cr.scrape_congressional_record import CRWriter
+from test.test_scrape_congressional_record import (
+    day_level_files,
+    day_level_urls,
+    enddate,
+    expected_urls,
+    mock_text_helper,
+    record_level_files,
+    resources_dir,
+    startdate,
+)
+
+tmp_directory = "temp_layout"
+test_file = "parsing_test_input.txt"
+
+daily_files = [
+    "S2010-01-02.txt",
+    "H2010-01-02.txt",
+    "S2010-01-01.txt",
+    "H2010-02-03.txt",
+    "S2011-12-31.txt",
+]
+
+
+class LayoutTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def make_flat_archive(self):
+        for name in daily_files:
+            shutil.copy(
+                os.path.join(resources_dir, test_file),
+                os.path.join(tmp_directory, name),
+            )
+
+    def test_path(self):
+        self.assertEqual(
+            FlatLayout("archive").path("s", "2010-01-02"), "archive/S2010-01-02.txt"
+        )
+        self.assertEqual(
+            ShardedLayout("archive").path("s", "2010-01-02"),
+            os.path.join("archive", "S", "2010", "01", "S2010-01-02.txt"),
+        )
+
+    def test_migrate(self):
+        self.make_flat_archive()
+        layout = ShardedLayout(tmp_directory)
+        self.assertEqual(layout.migrate(), len(daily_files))
+        self.assertEqual(sorted(os.listdir(tmp_directory)), ["H", "S"])
+
+        shard = os.path.join(tmp_directory, "S", "2010", "01")
+        with open(os.path.join(shard, "index.json")) as f:
+            index = json.load(f)
+        self.assertEqual(sorted(index), ["2010-01-01", "2010-01-02"])
+        self.assertEqual(index["2010-01-02"]["file"], "S2010-01-02.txt")
+        self.assertEqual(
+            index["2010-01-02"]["sha256"],
+            file_hash(os.path.join(resources_dir, test_file)),
+        )
+        self.assertIsInstance(open_layout(tmp_directory), ShardedLayout)
+
+    def test_days_in_range(self):
+        self.make_flat_archive()
+        flat_days = FlatLayout(tmp_directory).days("s", "2010-01-02", "2011-12-31")
+        ShardedLayout(tmp_directory).migrate()
+        layout = ShardedLayout(tmp_directory)
+        days = layout.days("s", "2010-01-02", "2011-12-31")
+        self.assertEqual([d for d, _ in days], ["2010-01-02", "2011-12-31"])
+        self.assertEqual([d for d, _ in days], [d for d, _ in flat_days])
+        self.assertEqual(
+            [os.path.basename(f) for f in layout.files("2010-01-02", "2010-02-03")],
+            ["H2010-01-02.txt", "S2010-01-02.txt", "H2010-02-03.txt"],
+        )
+        # Months outside the range are not read
+        os.remove(os.path.join(tmp_directory, "S", "2011", "12", "index.json"))
+        self.assertEqual(len(layout.days("s", end="2010-12-31")), 2)
+
+    def test_day_file(self):
+        self.make_flat_archive()
+        ShardedLayout(tmp_directory).migrate()
+        self.assertEqual(
+            day_file(tmp_directory, "S", "2010-01-02"),
+            os.path.join(tmp_directory, "S", "2010", "01", "S2010-01-02.txt"),
+        )
+
+    def test_find_input_files(self):
+        self.make_flat_archive()
+        flat_files = find_input_files([tmp_directory], "2010-01-02", "2010-12-31")
+        self.assertEqual(
+            [os.path.basename(f) for f in flat_files],
+            ["H2010-01-02.txt", "S2010-01-02.txt", "H2010-02-03.txt"],
+        )
+        ShardedLayout(tmp_directory).migrate()
+        sharded_files = find_input_files([tmp_directory], "2010-01-02", "2010-12-31")
+        self.assertEqual(
+            [os.path.basename(f) for f in sharded_files],
+            [os.path.basename(f) for f in flat_files],
+        )
+
+        output = os.path.join(tmp_directory, "records.tsv")
+        self.assertEqual(
+            run_batch([tmp_directory], output, workers=1, end="2010-01-01"), 1
+        )
+
+    @requests_mock.Mocker()
+    def test_sharded_scrape(self, mocker):
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        flat_directory = os.path.join(tmp_directory, "flat")
+        sharded_directory = os.path.join(tmp_directory, "sharded")
+        os.makedirs(flat_directory)
+        os.makedirs(sharded_directory)
+        CRWriter("s", flat_directory, startdate, enddate).run()
+        manifest = ScrapeManifest(sharded_directory)
+        CRWriter(
+            "s",
+            sharded_directory,
+            startdate,
+            enddate,
+            manifest=manifest,
+            layout="sharded",
+        ).run()
+
+        days = ShardedLayout(sharded_directory).days("s")
+        self.assertEqual([d for d, _ in days], ["2010-01-02"])
+        with open(days[0][1]) as f, open(
+            os.path.join(flat_directory, "S2010-01-02.txt")
+        ) as g:
+            self.assertEqual(f.read(), g.read())
+
+        # A manifest rebuilt from the indexes picks up where the scrape stopped
+        os.remove(manifest.path)
+        manifest = ScrapeManifest(sharded_directory)
+        manifest.bootstrap("s", [d for d, _ in days])
+        self.assertEqual(
+            manifest.next_start_date("s").strftime("%Y-%m-%d"), "2010-01-03"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
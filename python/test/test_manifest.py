@@ -0,0 +1,156 @@
+"""Tests ScrapeManifest and its use by CRWriter"""
+
+import os
+import shutil
+import unittest
+from datetime import date
+
+import requests_mock
+
+from cr.manifest import ScrapeManifest
+from cr.scrape_congressional_record import CRWriter
+from test.test_scrape_congressional_record import (
+    day_level_files,
+    day_level_urls,
+    enddate,
+    expected_urls,
+    mock_text_helper,
+    record_level_files,
+    resources_dir,
+    startdate,
+)
+
+tmp_directory = "temp_manifest"
+
+
+class ScrapeManifestTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+        self.manifest = ScrapeManifest(tmp_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def test_record_and_reload(self):
+        self.manifest.record_fetched("h", date(2010, 1, 2), "content")
+        self.manifest.record_empty("h", date(2010, 1, 3), checked_on=date(2010, 2, 1))
+        self.manifest.record_failed("s", date(2010, 1, 2), "503")
+        self.manifest.flush()
+
+        reloaded = ScrapeManifest(tmp_directory)
+        self.assertTrue(reloaded.is_done("H", date(2010, 1, 2)))
+        self.assertTrue(reloaded.is_done("H", date(2010, 1, 3)))
+        self.assertFalse(reloaded.is_done("S", date(2010, 1, 2)))
+        self.assertEqual(reloaded.next_start_date("h"), date(2010, 1, 4))
+        # Each chamber is tracked on its own
+        self.assertEqual(reloaded.next_start_date("s"), date(2010, 1, 2))
+
+    def test_unsettled_empty_day_is_retried(self):
+        self.manifest.record_fetched("s", date(2010, 1, 4), "content")
+        self.manifest.record_empty("s", date(2010, 1, 5), checked_on=date(2010, 1, 5))
+        self.assertFalse(self.manifest.is_done("s", date(2010, 1, 5)))
+        self.assertEqual(self.manifest.next_start_date("s"), date(2010, 1, 5))
+
+    def test_unfinished_day_is_retried(self):
+        self.manifest.record_started("s", date(2010, 1, 3))
+        self.manifest.record_started("s", date(2010, 1, 4))
+        # A later day finished while an earlier one was still in flight
+        self.manifest.record_fetched("s", date(2010, 1, 4), "content")
+        self.manifest.flush()
+        reloaded = ScrapeManifest(tmp_directory)
+        self.assertFalse(reloaded.is_done("s", date(2010, 1, 3)))
+        self.assertEqual(reloaded.next_start_date("s"), date(2010, 1, 3))
+        reloaded.record_empty("s", date(2010, 1, 3), checked_on=date(2010, 2, 1))
+        self.assertEqual(reloaded.next_start_date("s"), date(2010, 1, 5))
+
+    def test_saves_are_batched(self):
+        manifest = ScrapeManifest(tmp_directory, save_every=3)
+        manifest.record_started("s", date(2010, 1, 2))
+        manifest.record_fetched("s", date(2010, 1, 2), "content")
+        self.assertFalse(os.path.exists(manifest.path))
+        manifest.record_empty("s", date(2010, 1, 3))
+        self.assertTrue(ScrapeManifest(tmp_directory).is_done("s", date(2010, 1, 2)))
+        manifest.record_failed("s", date(2010, 1, 4), "503")
+        manifest.flush()
+        self.assertEqual(
+            ScrapeManifest(tmp_directory).days_to_retry("s"),
+            [date(2010, 1, 4)],
+        )
+
+    def test_empty_directory(self):
+        self.assertIsNone(self.manifest.next_start_date("h"))
+        self.manifest.bootstrap("h")
+        self.assertIsNone(self.manifest.next_start_date("h"))
+
+    def test_bootstrap(self):
+        for name in ["H2010-01-02.txt", "H2010-01-05.txt", "S2010-01-09.txt"]:
+            open(os.path.join(tmp_directory, name), "w").close()
+        self.manifest.bootstrap("h")
+        self.assertEqual(self.manifest.next_start_date("h"), date(2010, 1, 6))
+        self.assertIsNone(self.manifest.next_start_date("s"))
+
+
+class CRWriterManifestTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    @requests_mock.Mocker()
+    def test_run_skips_settled_days(self, mocker):
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        manifest = ScrapeManifest(tmp_directory)
+        CRWriter("s", tmp_directory, startdate, enddate, manifest=manifest).run()
+
+        self.assertTrue(manifest.is_done("s", date(2010, 1, 1)))
+        self.assertTrue(manifest.is_done("s", date(2010, 1, 2)))
+        calls = mocker.call_count
+        CRWriter(
+            "s",
+            tmp_directory,
+            startdate,
+            enddate,
+            manifest=ScrapeManifest(tmp_directory),
+        ).run()
+        self.assertEqual(mocker.call_count, calls)
+
+    @requests_mock.Mocker()
+    def test_run_records_failures(self, mocker):
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        mocker.get(expected_urls[0], status_code=503)
+        for u, f in zip(expected_urls[1:], record_level_files[1:]):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        manifest = ScrapeManifest(tmp_directory)
+        CRWriter(
+            "s", tmp_directory, startdate, enddate, max_retries=0, manifest=manifest
+        ).run()
+
+        self.assertEqual(manifest.days_to_retry("s"), [date(2010, 1, 2)])
+        self.assertEqual(manifest.next_start_date("s"), date(2010, 1, 2))
+
+    @requests_mock.Mocker()
+    def test_interrupted_day_is_retried(self, mocker):
+        mocker.get(day_level_urls[0], exc=KeyboardInterrupt)
+        manifest = ScrapeManifest(tmp_directory)
+        manifest.record_fetched("s", date(2010, 1, 2), "content")
+        with self.assertRaises(KeyboardInterrupt):
+            CRWriter("s", tmp_directory, startdate, startdate, manifest=manifest).run()
+
+        reloaded = ScrapeManifest(tmp_directory)
+        self.assertEqual(reloaded.days_to_retry("s"), [date(2010, 1, 1)])
+        self.assertEqual(reloaded.next_start_date("s"), date(2010, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Tests run metrics and their collection by the scraper and batch parser"""
+
+import json
+import os
+import shutil
+import unittest
+
+import requests_mock
+
+from cr.batch_parse import run_batch
+from cr.metrics import NULL_METRICS, Metrics
+from cr.scrape_congressional_record import CRWriter
+from test.test_scrape_congressional_record import (
+    day_level_files,
+    day_level_urls,
+    enddate,
+    expected_urls,
+    mock_text_helper,
+    record_level_files,
+    resources_dir,
+    startdate,
+)
+
+tmp_directory = "temp_metrics"
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def test_counters_and_timers(self):
+        metrics = Metrics()
+        metrics.count("requests")
+        metrics.count("bytes_fetched", 100)
+        with metrics.time("parse"):
+            pass
+        metrics.add_time("parse", 2.0)
+        other = Metrics()
+        other.count("requests", 2)
+        other.add_time("parse", 3.0)
+        metrics.merge(other.report())
+
+        report = metrics.report()
+        self.assertEqual(report["counters"], {"requests": 3, "bytes_fetched": 100})
+        self.assertEqual(report["timers"]["parse"]["calls"], 3)
+        self.assertEqual(report["timers"]["parse"]["max_seconds"], 3.0)
+        self.assertGreaterEqual(report["timers"]["parse"]["seconds"], 5.0)
+
+    def test_save(self):
+        metrics = Metrics()
+        metrics.count("days-fetched", 2)
+        metrics.add_time("fetch", 1.5)
+        json_path = os.path.join(tmp_directory, "run.json")
+        prometheus_path = os.path.join(tmp_directory, "cr.prom")
+        metrics.save(json_path, prometheus_path)
+
+        with open(json_path) as f:
+            self.assertEqual(json.load(f)["counters"], {"days-fetched": 2})
+        with open(prometheus_path) as f:
+            lines = f.read().splitlines()
+        self.assertIn("# TYPE cr_days_fetched_total counter", lines)
+        self.assertIn("cr_days_fetched_total 2", lines)
+        self.assertIn('cr_stage_seconds_total{stage="fetch"} 1.5', lines)
+
+    def test_null_metrics(self):
+        NULL_METRICS.count("requests")
+        with NULL_METRICS.time("parse"):
+            pass
+        self.assertFalse(NULL_METRICS.enabled)
+        self.assertFalse(hasattr(NULL_METRICS, "counters"))
+
+    @requests_mock.Mocker()
+    def test_scrape_metrics(self, mocker):
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        metrics = Metrics()
+        CRWriter("s", tmp_directory, startdate, enddate, metrics=metrics).run()
+
+        report = metrics.report()
+        counters = report["counters"]
+        self.assertEqual(counters["requests"], mocker.call_count)
+        self.assertEqual(counters["days_fetched"], 1)
+        self.assertEqual(counters["days_empty"], 1)
+        self.assertEqual(counters["sections_fetched"], 3)
+        self.assertGreater(counters["bytes_fetched"], 0)
+        self.assertEqual(report["timers"]["fetch"]["calls"], mocker.call_count)
+        self.assertEqual(report["timers"]["save"]["calls"], 1)
+
+    def test_batch_metrics(self):
+        for name in ["S2010-01-02.txt", "H2010-01-02.txt"]:
+            shutil.copy(
+                os.path.join(resources_dir, "parsing_test_input.txt"),
+                os.path.join(tmp_directory, name),
+            )
+        output = os.path.join(tmp_directory, "speeches.tsv")
+        serial, parallel = Metrics(), Metrics()
+        run_batch([tmp_directory], output, workers=1, metrics=serial)
+        run_batch([tmp_directory], output, workers=2, metrics=parallel)
+
+        # Worker process metrics are merged into the parent's
+        self.assertEqual(parallel.counters, serial.counters)
+        self.assertEqual(serial.counters["days_parsed"], 2)
+        self.assertEqual(serial.counters["pages_split"], 8)
+        self.assertEqual(parallel.report()["timers"]["parse"]["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Tests the parse result cache behind CRParser.load"""
+
+import gzip
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from cr.parse_cache import ParseCache
+from cr.parse_congressional_record import CRParser
+
+tmp_directory = "temp_parse_cache"
+resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+test_file = os.path.join(resources_dir, "parsing_test_input.txt")
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        self.archive = os.path.join(tmp_directory, "archive")
+        os.makedirs(self.archive)
+        self.path = os.path.join(self.archive, "S2010-01-02.txt")
+        shutil.copy(test_file, self.path)
+        self.cache_directory = os.path.join(tmp_directory, "cache")
+        self.cache = ParseCache(self.cache_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def load(self, cache=None):
+        return CRParser.load("2010-01-02", "S", self.archive, cache or self.cache)
+
+    def test_load(self):
+        expected = CRParser(self.path)
+        expected.process_file()
+        first = self.load()
+        second = self.load()
+
+        for parser in [first, second]:
+            self.assertEqual(parser.records, expected.records)
+            self.assertEqual(parser.speeches, expected.speeches)
+            self.assertEqual(parser.capture_speakers(), expected.capture_speakers())
+        self.assertEqual((self.cache.misses, self.cache.memory_hits), (1, 1))
+        # Each load gets its own records, so changing one doesn't change the cache
+        second.records[0].text = "changed"
+        self.assertEqual(self.load().records, expected.records)
+
+        # A new process finds the day on disk
+        cache = ParseCache(self.cache_directory)
+        self.assertEqual(self.load(cache).records, expected.records)
+        self.assertEqual((cache.misses, cache.disk_hits), (0, 1))
+
+    def test_invalidation(self):
+        records = self.load().records
+        # Touching the file keeps the entry, changing it doesn't
+        os.utime(self.path, ns=(0, 0))
+        self.load()
+        self.assertEqual(self.cache.misses, 1)
+        with open(self.path, "a") as f:
+            f.write("  Mr. REID. I yield the floor.")
+        expected = CRParser(self.path)
+        expected.process_file()
+        changed = self.load().records
+        self.assertEqual(self.cache.misses, 2)
+        self.assertNotEqual(changed, records)
+        self.assertEqual(changed, expected.records)
+        # So does a change to the parser configuration
+        with mock.patch("cr.parse_congressional_record.PARSER_VERSION", 0):
+            self.load()
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_touched_file_saved(self):
+        self.load()
+        os.utime(self.path, ns=(0, 0))
+        self.load()
+        # Another process finds the new mtime on disk, so doesn't hash the file again
+        cache = ParseCache(self.cache_directory)
+        with mock.patch("cr.parse_cache.file_hash") as hashed:
+            self.load(cache)
+        hashed.assert_not_called()
+        self.assertEqual(cache.disk_hits, 1)
+
+    def test_disk_cap(self):
+        self.load()
+        (pickle_name,) = os.listdir(self.cache_directory)
+        size = os.path.getsize(os.path.join(self.cache_directory, pickle_name))
+        # Room for one and a half days
+        cache = ParseCache(self.cache_directory, max_disk_bytes=size * 3 // 2)
+        shutil.copy(test_file, os.path.join(self.archive, "H2010-01-02.txt"))
+        os.utime(os.path.join(self.cache_directory, pickle_name), ns=(0, 0))
+        CRParser.load("2010-01-02", "H", self.archive, cache)
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+        # The least recently used day was deleted
+        cache = ParseCache(self.cache_directory)
+        CRParser.load("2010-01-02", "H", self.archive, cache)
+        self.load(cache)
+        self.assertEqual((cache.disk_hits, cache.misses), (1, 1))
+        self.assertEqual(cache.prune(), 0)
+
+    def test_eviction(self):
+        shutil.copy(test_file, os.path.join(self.archive, "H2010-01-02.txt"))
+        with open(test_file, "rb") as f, gzip.open(
+            os.path.join(self.archive, "S2010-01-03.txt.gz"), "wb"
+        ) as g:
+            g.write(f.read())
+        self.load()
+        # Room for one and a half days
+        cache = ParseCache(None, max_bytes=self.cache.bytes * 3 // 2)
+        days = [("S", "2010-01-02"), ("H", "2010-01-02"), ("S", "2010-01-03")]
+        for chamber, day in days:
+            CRParser.load(day, chamber, self.archive, cache)
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+        self.assertEqual(len(cache.days), 1)
+        # The most recently loaded day is kept
+        CRParser.load("2010-01-03", "S", self.archive, cache)
+        self.assertEqual(cache.memory_hits, 1)
+        with self.assertRaises(FileNotFoundError):
+            CRParser.load("2010-01-04", "S", self.archive, cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Tests the parser's profile mode"""
+
+import os
+import pstats
+import shutil
+import unittest
+
+from cr.parse_congressional_record import CRParser, main
+from cr.parse_profile import PAGE_STAGES, ParseProfile, profile_file
+
+tmp_directory = "temp_profile"
+resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+test_file = "parsing_test_input.txt"
+
+
+class ParseProfileTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+        self.input_file = os.path.join(tmp_directory, "S2010-01-02.txt")
+        shutil.copy(os.path.join(resources_dir, test_file), self.input_file)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_same_rows(self):
+        profile = ParseProfile(self.input_file)
+        rows = profile.parse()
+        parser = CRParser(self.input_file)
+        expected = list(parser.iter_records(with_pages=True))
+        self.assertEqual([row[2:] for row in rows], expected)
+        self.assertEqual(len(profile.pages), parser.pages_split)
+        self.assertEqual(profile.slow_pages, [])
+
+        timers = profile.metrics.report()["timers"]
+        for stage in PAGE_STAGES:
+            self.assertEqual(timers[stage]["calls"], len(profile.pages))
+
+    def test_main(self):
+        expected_output = os.path.join(tmp_directory, "expected.tsv")
+        output = os.path.join(tmp_directory, "profiled.tsv")
+        main(self.input_file, False, expected_output)
+        report = profile_file(self.input_file, False, output)
+        self.assertEqual(self.read(output), self.read(expected_output))
+        self.assertIn("speakers", report)
+        self.assertIn("0 pages over 0.1s in regexes", report)
+
+    def test_slow_pages_reproduce(self):
+        profile = ParseProfile(self.input_file, slow_page_seconds=0)
+        with self.assertLogs("cr.parse_profile", "WARNING") as logs:
+            rows = profile.parse()
+        self.assertEqual(len(logs.output), len(profile.pages))
+        self.assertEqual(len(profile.slow_pages), len(profile.pages))
+        paths = profile.dump_slow_pages(os.path.join(tmp_directory, "slow"))
+        self.assertEqual(len(paths), len(profile.pages))
+
+        # Each saved page parses to the rows of that page, page range included
+        pages = [ParseProfile(path).parse() for path in paths]
+        self.assertEqual(
+            [(r.date, r.title, r.pages, r.text) for page in pages for r in page],
+            [(r.date, r.title, r.pages, r.text) for r in rows],
+        )
+
+    def test_cprofile(self):
+        stats_path = os.path.join(tmp_directory, "parse.pstats")
+        report = profile_file(
+            self.input_file,
+            False,
+            os.path.join(tmp_directory, "profiled.tsv"),
+            cprofile_path=stats_path,
+        )
+        self.assertIn("function calls", report)
+        self.assertGreater(pstats.Stats(stats_path).total_calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
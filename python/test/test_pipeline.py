@@ -0,0 +1,84 @@
+"""Tests the scrape-to-parse pipeline"""
+
+import os
+import shutil
+import unittest
+from datetime import date
+
+import requests_mock
+
+from cr.batch_parse import run_batch
+from cr.manifest import ScrapeManifest
+from cr.pipeline import run_pipeline
+from cr.writers import TSVWriter
+from test.test_scrape_congressional_record import (
+    day_level_files,
+    day_level_urls,
+    enddate,
+    expected_urls,
+    mock_text_helper,
+    record_level_files,
+    resources_dir,
+    startdate,
+)
+
+tmp_directory = "temp_pipeline"
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        self.raw_directory = os.path.join(tmp_directory, "raw")
+        os.makedirs(self.raw_directory)
+        self.output = os.path.join(tmp_directory, "speeches.tsv")
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def mock_pages(self, mocker):
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    @requests_mock.Mocker()
+    def test_pipeline_matches_batch_parse(self, mocker):
+        self.mock_pages(mocker)
+        with TSVWriter(self.output) as writer:
+            days = run_pipeline(
+                writer,
+                "s",
+                self.raw_directory,
+                startdate,
+                enddate,
+                archive=True,
+                parallel_days=2,
+                queue_size=1,
+            )
+        self.assertEqual(days, 1)
+
+        batch_output = os.path.join(tmp_directory, "batch.tsv")
+        run_batch([self.raw_directory], batch_output, workers=1)
+        self.assertEqual(self.read(self.output), self.read(batch_output))
+
+    @requests_mock.Mocker()
+    def test_pipeline_without_archive(self, mocker):
+        self.mock_pages(mocker)
+        manifest = ScrapeManifest(self.raw_directory)
+        with TSVWriter(self.output) as writer:
+            run_pipeline(
+                writer, "s", self.raw_directory, startdate, enddate, manifest=manifest
+            )
+        self.assertEqual(os.listdir(self.raw_directory), ["manifest.json"])
+        self.assertTrue(manifest.is_done("s", date(2010, 1, 2)))
+        self.assertIn("2010-01-02\tS\t", self.read(self.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -107,6 +107,22 @@ class CRScraperTest(unittest.TestCase):
         with self.assertRaises(NoCRContentException):
             self.test_exception.run()
 
+    @requests_mock.Mocker()
+    def test_run_concurrent(self, mocker):
+        # Concurrent fetching should give exactly the same content as the serial path
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        self.test_scraper.run()
+        concurrent_scraper = CRScraper(
+            day_level_urls[1],
+            os.path.join(tmp_directory, output_filenames[1]),
+            max_workers=3,
+        )
+        concurrent_scraper.run()
+        self.assertEqual(concurrent_scraper.content, self.test_scraper.content)
+
     @requests_mock.Mocker()
     def test_save_file(self, mocker):
         mock_text_helper(
@@ -177,6 +193,25 @@ class CRWriterTest(unittest.TestCase):
             os.path.isfile(os.path.join(tmp_directory, output_filenames[0]))
         )
 
+    @requests_mock.Mocker()
+    def test_run_parallel_days(self, mocker):
+        with open(os.path.join(resources_dir, expected_filtered_content_file)) as f:
+            expected_output = f.read()
+        for u, f in zip(day_level_urls, day_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        for u, f in zip(expected_urls, record_level_files):
+            mock_text_helper(mocker, u, os.path.join(resources_dir, f))
+        CRWriter(
+            "s", tmp_directory, startdate, enddate, parallel_days=2, requests_per_second=100
+        ).run()
+
+        with open(os.path.join(tmp_directory, output_filenames[1])) as f:
+            test_output = f.read()
+        self.assertIn(test_output, expected_output)
+        self.assertFalse(
+            os.path.isfile(os.path.join(tmp_directory, output_filenames[0]))
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+"""Tests the SQLite speech store"""
+
+import os
+import shutil
+import unittest
+
+from cr.batch_parse import run_batch
+from cr.speech_store import SpeechStore
+from test.test_writers import test_rows
+
+tmp_directory = "temp_speech_store"
+resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
+
+class SpeechStoreTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+        self.path = os.path.join(tmp_directory, "speeches.sqlite")
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def test_search(self):
+        with SpeechStore(self.path, batch_size=3) as store:
+            store.write_rows(test_rows)
+        with SpeechStore(self.path) as store:
+            self.assertEqual(len(store.search()), 4)
+            rows = store.search("clerk")
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0][3], "The PRESIDING OFFICER")
+            self.assertIn("[clerk]", rows[0][5])
+            self.assertEqual(len(store.search('"let us pray"')), 1)
+            self.assertEqual(len(store.search('"pray let"')), 0)
+            rows = store.search(speaker="mr. mcconnell", start="2010-01-02")
+            self.assertEqual([r[5] for r in rows], ["Zippity doo dah"])
+            self.assertEqual(store.search(chamber="h", end="2010-01-31"), [])
+
+    def test_rewriting_a_day_replaces_it(self):
+        with SpeechStore(self.path) as store:
+            store.write_rows(test_rows)
+        changed = [row[:-1] + ("Changed",) for row in test_rows[1:2]]
+        with SpeechStore(self.path) as store:
+            store.write_rows(changed)
+            self.assertEqual(len(store.search(start="2010-01-02", end="2010-01-02")), 1)
+            self.assertEqual(store.search("zippity"), [])
+            self.assertEqual(len(store.search("changed")), 1)
+
+    def test_run_batch_sqlite(self):
+        input_directory = os.path.join(tmp_directory, "raw")
+        os.mkdir(input_directory)
+        shutil.copy(
+            os.path.join(resources_dir, "parsing_test_input.txt"),
+            os.path.join(input_directory, "S2010-01-02.txt"),
+        )
+        run_batch([input_directory], self.path, workers=1, output_format="sqlite")
+        with SpeechStore(self.path) as store:
+            rows = store.search(speaker="Mr. McCONNELL")
+            self.assertTrue(rows)
+            self.assertTrue(all(r[:2] == ("2010-01-02", "S") for r in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""Tests output backends for parsed speech records"""
+
+import os
+import shutil
+import unittest
+
+from cr.writers import (
+    RECORD_COLUMNS,
+    SHARD_KEYS,
+    AppendingTSVWriter,
+    ParquetWriter,
+    ShardedWriter,
+    TSVWriter,
+    pa,
+)
+
+tmp_directory = "temp_writers"
+
+test_rows = [
+    ("2010-01-01", "S", "", "", "S1", "Senate\n  The 2nd day"),
+    (
+        "2010-01-02",
+        "S",
+        "APPOINTMENT",
+        "The PRESIDING OFFICER",
+        "S1",
+        "The clerk\twill read.",
+    ),
+    ("2010-01-02", "S", "APPOINTMENT", "Mr. McCONNELL", "S1-S2", "Zippity doo dah"),
+    ("2010-02-03", "H", "PRAYER", "The SPEAKER", "H1", "Let us pray."),
+]
+
+
+class WritersTest(unittest.TestCase):
+    def setUp(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.mkdir(tmp_directory)
+
+    def tearDown(self):
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+
+    def test_tsv_writer(self):
+        path = os.path.join(tmp_directory, "speeches.tsv")
+        with TSVWriter(path) as writer:
+            writer.write_rows(test_rows)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "\t".join(RECORD_COLUMNS))
+        # Newlines and tabs are dropped from values
+        self.assertEqual(lines[1].split("\t")[-1], "Senate  The 2nd day")
+        self.assertEqual(lines[2].split("\t")[-1], "The clerkwill read.")
+        self.assertEqual(len(lines), 5)
+
+    def test_sharded_writer(self):
+        with ShardedWriter(tmp_directory, SHARD_KEYS["month"]) as writer:
+            writer.write_rows(test_rows)
+        self.assertEqual(
+            sorted(os.listdir(tmp_directory)), ["2010-01.tsv", "2010-02.tsv"]
+        )
+        with self.assertRaises(ValueError):
+            with ShardedWriter(tmp_directory, SHARD_KEYS["month"]) as writer:
+                writer.write_rows(test_rows + test_rows[:1])
+
+    def read_lines(self, path):
+        with open(path) as f:
+            return [line for line in f.read().splitlines() if line]
+
+    def test_appending_writer(self):
+        path = os.path.join(tmp_directory, "speeches.tsv")
+        with AppendingTSVWriter(path) as writer:
+            writer.write_rows(test_rows[:3])
+        with AppendingTSVWriter(path) as writer:
+            # Unchanged days are skipped, new days are appended
+            self.assertFalse(writer.write_day("2010-01-01", "S", test_rows[:1]))
+            writer.write_rows(test_rows[3:])
+        lines = self.read_lines(path)
+        self.assertEqual(lines[0], "\t".join(RECORD_COLUMNS))
+        self.assertEqual(len(lines), 5)
+
+        changed = [row[:-1] + ("Changed",) for row in test_rows[1:3]]
+        with AppendingTSVWriter(path) as writer:
+            self.assertTrue(writer.write_day("2010-01-02", "S", changed))
+            # The last day in the file is replaced by truncating
+            self.assertTrue(writer.write_day("2010-01-02", "S", changed[:1]))
+        lines = self.read_lines(path)
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[-1].split("\t")[-1], "Changed")
+        self.assertEqual(
+            [line[:12] for line in lines[1:3]], ["2010-01-01\tS", "2010-02-03\tH"]
+        )
+
+    def test_appending_writer_rebuilds_index(self):
+        path = os.path.join(tmp_directory, "speeches.tsv")
+        # A corpus written without an index, with a partial last row
+        with TSVWriter(path) as writer:
+            writer.write_rows(test_rows)
+        with open(path, "a") as f:
+            f.write("2010-02-04\tH\tPRAY")
+        with AppendingTSVWriter(path) as writer:
+            self.assertFalse(writer.write_day("2010-02-03", "H", test_rows[3:]))
+            next_day = ("2010-02-04",) + test_rows[3][1:]
+            self.assertTrue(writer.write_day("2010-02-04", "H", [next_day]))
+        lines = self.read_lines(path)
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[-1].startswith("2010-02-04\tH\tPRAYER\t"))
+
+    def test_appending_writer_ignores_stale_index(self):
+        path = os.path.join(tmp_directory, "speeches.tsv")
+        with AppendingTSVWriter(path) as writer:
+            writer.write_rows(test_rows)
+        # The corpus is deleted but its index is left behind
+        os.remove(path)
+        with AppendingTSVWriter(path) as writer:
+            self.assertTrue(writer.write_day("2010-02-03", "H", test_rows[3:]))
+        lines = self.read_lines(path)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("2010-02-03\tH\tPRAYER\t"))
+
+    def test_appending_writer_compacts(self):
+        path = os.path.join(tmp_directory, "speeches.tsv")
+        full_path = os.path.join(tmp_directory, "full.tsv")
+        changed = [row[:-1] + ("Changed",) for row in test_rows[1:3]]
+        with TSVWriter(full_path) as writer:
+            writer.write_rows(test_rows[:1] + changed + test_rows[3:])
+        with AppendingTSVWriter(path, compact_fraction=None) as writer:
+            writer.write_rows(test_rows)
+            self.assertTrue(writer.write_day("2010-01-02", "S", changed))
+            self.assertGreater(writer.dead, 0)
+        with open(path) as f:
+            self.assertIn("\n\n", f.read())
+
+        # The count of overwritten bytes outlives the writer
+        with AppendingTSVWriter(path, compact_fraction=None) as writer:
+            dead = writer.dead
+            self.assertEqual(writer.compact(), dead)
+            self.assertEqual(writer.dead, 0)
+            # The index follows the rows to their new offsets
+            self.assertFalse(writer.write_day("2010-02-03", "H", test_rows[3:]))
+            self.assertTrue(writer.write_day("2010-01-01", "S", test_rows[:1] * 2))
+            self.assertTrue(writer.write_day("2010-01-01", "S", test_rows[:1]))
+        self.assertEqual(
+            sorted(self.read_lines(path)), sorted(self.read_lines(full_path))
+        )
+
+        # By default the corpus is compacted once overwritten rows are a quarter of it
+        with AppendingTSVWriter(path) as writer:
+            self.assertTrue(writer.write_day("2010-01-02", "S", test_rows[1:3]))
+            self.assertEqual(writer.dead, 0)
+        with open(path) as f:
+            self.assertNotIn("\n\n", f.read())
+
+    @unittest.skipUnless(pa, "pyarrow is not installed")
+    def test_parquet_writer(self):
+        import pyarrow.parquet as pq
+
+        path = os.path.join(tmp_directory, "speeches.parquet")
+        with ParquetWriter(path, row_group_size=3) as writer:
+            writer.write_rows(test_rows)
+
+        parquet_file = pq.ParquetFile(path)
+        self.assertEqual(parquet_file.metadata.num_rows, 4)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        speakers = pq.read_table(path, columns=["speaker"])
+        self.assertTrue(pa.types.is_dictionary(speakers.schema.field("speaker").type))
+        self.assertEqual(speakers.column("speaker").to_pylist()[2], "Mr. McCONNELL")
+        table = pq.read_table(path)
+        self.assertEqual(table.column_names, list(RECORD_COLUMNS))
+        self.assertEqual(str(table.column("date").to_pylist()[0]), "2010-01-01")
+        self.assertEqual(table.column("text").to_pylist()[0], "Senate\n  The 2nd day")
+
+    @unittest.skipUnless(pa, "pyarrow is not installed")
+    def test_parquet_writer_undated_row(self):
+        import pyarrow.parquet as pq
+
+        path = os.path.join(tmp_directory, "speeches.parquet")
+        undated = ("",) + test_rows[1][1:]
+        with ParquetWriter(path) as writer:
+            writer.write_rows([test_rows[0], undated])
+        dates = pq.read_table(path).column("date")
+        self.assertEqual(dates.null_count, 1)
+        self.assertIsNone(dates.to_pylist()[1])
+
+
+if __name__ == "__main__":
+    unittest.main()